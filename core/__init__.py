@@ -7,7 +7,6 @@ Author: Michael Steele <michael.steele@deepgram.com>
 Licensed under the MIT License. See LICENSE file for details.
 """
 
-from .backend import StorageBackend, S3StorageBackend, LocalStorageBackend, FileTracker, create_storage_backend
 from .config import RepoConfig
 
 __all__ = [
@@ -19,6 +18,16 @@ __all__ = [
     'create_storage_backend'
 ]
 
+
+def __getattr__(name):
+    # The storage backends pull in boto3; load them on first use so that
+    # commands which never touch storage (config, --help) start quickly
+    if name in __all__:
+        from . import backend
+        return getattr(backend, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 class Colors:
     """ANSI color codes for terminal output"""
     RED = '\033[91m'
@@ -8,18 +8,30 @@ Licensed under the MIT License. See LICENSE file for details.
 """
 
 import os
-import subprocess
+import base64
+import contextlib
+import shutil
+from concurrent.futures import ThreadPoolExecutor
 from abc import ABC, abstractmethod
-from typing import List, Optional
+from typing import Dict, Iterator, List, Optional, Tuple
 from .config import RepoConfig
 
 try:
     import boto3
+    from boto3.s3.transfer import TransferConfig, create_transfer_manager
+    from botocore.config import Config as BotoConfig
     from botocore.exceptions import ClientError
 except ImportError:
     boto3 = None
     ClientError = Exception
 
+# Keys per DeleteObjects request (S3 API limit)
+_S3_DELETE_BATCH = 1000
+# Concurrent requests per client; also sizes the HTTPS connection pool
+_S3_MAX_CONCURRENCY = 16
+# Parallel part transfers per multipart upload/download
+_S3_PART_CONCURRENCY = 10
+
 
 class FileTracker:
     """Track file changes during repository operations"""
@@ -86,6 +98,45 @@ class StorageBackend(ABC):
         """Delete a file from storage"""
         pass
     
+    @abstractmethod
+    def delete_files(self, paths: List[str]) -> None:
+        """Delete several files from storage (backends can batch this)
+        
+        Args:
+            paths: Paths of the files to delete
+        """
+        pass
+    
+    def try_delete_files(self, paths: List[str]) -> Dict[str, str]:
+        """Delete several files, reporting failures instead of raising
+        
+        Args:
+            paths: Paths of the files to delete
+        
+        Returns:
+            Dictionary mapping each path that could not be deleted to the
+            reason; empty if every file was deleted
+        """
+        failed = {}
+        for path in paths:
+            try:
+                self.delete_file(path)
+            except Exception as e:
+                failed[path] = str(e)
+        return failed
+    
+    @abstractmethod
+    def delete_prefix(self, prefix: str) -> int:
+        """Delete every file under a prefix (backends can pipeline list and delete)
+        
+        Args:
+            prefix: Path prefix to delete under
+        
+        Returns:
+            Number of files deleted
+        """
+        pass
+    
     @abstractmethod
     def list_files(self, prefix: str, suffix: Optional[str] = None) -> List[str]:
         """List files with optional prefix and suffix filters
@@ -98,14 +149,33 @@ class StorageBackend(ABC):
             List of relative filenames (not full paths)
         """
         pass
-    
+
+    @abstractmethod
+    def list_file_info(self, prefix: str, suffix: Optional[str] = None) -> Dict[str, Tuple[int, Optional[str]]]:
+        """List files with their size and ETag in a single listing
+
+        Args:
+            prefix: Path prefix to search under
+            suffix: Optional file extension filter (e.g., '.rpm')
+
+        Returns:
+            Dictionary mapping relative filenames to (size, etag) tuples.
+            For single-part uploads the ETag is the hex MD5 of the content;
+            backends without ETags return None.
+        """
+        pass
+
     @abstractmethod
-    def sync_from_storage(self, remote_prefix: str, local_dir: str) -> List[str]:
+    def sync_from_storage(self, remote_prefix: str, local_dir: str,
+                          cache_dir: Optional[str] = None) -> List[str]:
         """Sync directory from storage to local
         
         Args:
             remote_prefix: Remote path prefix
             local_dir: Local directory to sync to
+            cache_dir: Optional directory of previously downloaded copies;
+                backends with remote storage reuse entries whose ETag still
+                matches instead of downloading them again
         
         Returns:
             List of files downloaded
@@ -144,6 +214,56 @@ class StorageBackend(ABC):
         """
         pass
     
+    @abstractmethod
+    def stream_file(self, remote_path: str, chunk_size: int = 1 << 20) -> Iterator[bytes]:
+        """Stream file content in chunks without buffering the whole file
+        
+        Args:
+            remote_path: Path to file in storage
+            chunk_size: Maximum size of each chunk in bytes
+        
+        Returns:
+            Iterator over the file content
+        """
+        pass
+    
+    def get_sha256(self, remote_path: str) -> Optional[str]:
+        """Get the SHA256 the backend stored for a file, if it has one
+        
+        Args:
+            remote_path: Path to file in storage
+        
+        Returns:
+            Hex SHA256 of the whole file, or None if the backend does not
+            keep one (callers must then hash the content themselves)
+        """
+        return None
+    
+    def list_file_versions(self, prefix: str) -> Optional[Dict[str, str]]:
+        """List the current version ID of each file, if the backend keeps versions
+        
+        Args:
+            prefix: Path prefix to search under
+        
+        Returns:
+            Dictionary mapping relative filenames to version IDs, or None if
+            the backend does not keep old versions of overwritten files
+        """
+        return None
+    
+    @abstractmethod
+    def restore_file_version(self, path: str, version_id: str) -> None:
+        """Make an earlier version of a file current again
+        
+        Only called with version IDs from list_file_versions, so backends
+        that return None there never see it.
+        
+        Args:
+            path: Path to file in storage
+            version_id: Version ID from list_file_versions
+        """
+        pass
+    
     @abstractmethod
     def copy_file(self, src_path: str, dst_path: str) -> None:
         """Copy a file within storage (backends can optimize this)
@@ -231,11 +351,44 @@ class S3StorageBackend(StorageBackend):
             profile_name=self.aws_profile,
             region_name=self.aws_region
         )
-        s3_config = {}
+        # Callers overlap requests on thread pools; size the connection
+        # pool to match so they don't queue on botocore's default of 10.
+        # Adaptive retries back off client-side when S3 returns SlowDown.
+        s3_config = {'config': BotoConfig(
+            max_pool_connections=_S3_MAX_CONCURRENCY,
+            retries={'max_attempts': 10, 'mode': 'adaptive'},
+            tcp_keepalive=True
+        )}
         if self.endpoint_url:
-            s3_config['endpoint_url'] = endpoint_url
+            s3_config['endpoint_url'] = self.endpoint_url
 
         self.s3_client = session.client('s3', **s3_config)
+        
+        # Large RPMs are split into 16 MiB parts transferred in parallel
+        self.transfer_config = TransferConfig(
+            multipart_threshold=8 * 1024 * 1024,
+            multipart_chunksize=16 * 1024 * 1024,
+            max_concurrency=_S3_PART_CONCURRENCY,
+            use_threads=True
+        )
+        # Whole-directory syncs share one transfer manager whose request pool
+        # spans every file (and every part of large ones)
+        self.bulk_transfer_config = TransferConfig(
+            multipart_threshold=8 * 1024 * 1024,
+            multipart_chunksize=16 * 1024 * 1024,
+            max_concurrency=_S3_MAX_CONCURRENCY,
+            use_threads=True
+        )
+
+        # Optionally have S3 store a SHA256 of every upload so it can be
+        # checked later with a HEAD request instead of a download. Off by
+        # default for custom endpoints, which may not support it.
+        self.checksum_sha256 = config.get('backend.s3.checksum_sha256')
+        if self.checksum_sha256 is None:
+            self.checksum_sha256 = not self.endpoint_url
+        self.upload_args = {'ChecksumAlgorithm': 'SHA256'} if self.checksum_sha256 else {}
+        # Bucket versioning status, looked up on first use
+        self._versioned = None
 
         self.debug = config.get('backend.debug', False)
     
@@ -253,23 +406,89 @@ class S3StorageBackend(StorageBackend):
         self.s3_client.download_file(
             self.bucket_name,
             remote_path,
-            local_path
+            local_path,
+            Config=self.transfer_config
         )
     
     def upload_file(self, local_path: str, remote_path: str) -> None:
         """Upload a file from local path to S3"""
-        self.s3_client.upload_file(local_path, self.bucket_name, remote_path)
+        self.s3_client.upload_file(
+            local_path,
+            self.bucket_name,
+            remote_path,
+            ExtraArgs=self.upload_args,
+            Config=self.transfer_config
+        )
     
     def delete_file(self, path: str) -> None:
         """Delete a file from S3"""
         self.s3_client.delete_object(Bucket=self.bucket_name, Key=path)
     
+    def delete_files(self, paths: List[str]) -> None:
+        """Delete files from S3, up to 1000 keys per DeleteObjects request"""
+        errors = self._delete_batches(paths)
+        if errors:
+            # Quiet mode only reports failures; surface the first like delete_object would
+            raise ClientError({'Error': errors[0]}, 'DeleteObjects')
+    
+    def try_delete_files(self, paths: List[str]) -> Dict[str, str]:
+        """Delete files from S3 in batches, returning the keys S3 refused"""
+        return {error['Key']: error.get('Message') or error.get('Code', 'unknown error')
+                for error in self._delete_batches(paths)}
+    
+    def _delete_batches(self, paths: List[str]) -> List[dict]:
+        """Delete paths in parallel DeleteObjects batches and collect per-key errors"""
+        batches = [paths[i:i + _S3_DELETE_BATCH] for i in range(0, len(paths), _S3_DELETE_BATCH)]
+        if len(batches) <= 1:
+            return [error for batch in batches for error in self._delete_batch(batch)]
+        with ThreadPoolExecutor(max_workers=min(_S3_MAX_CONCURRENCY, len(batches))) as executor:
+            return [error for result in executor.map(self._delete_batch, batches) for error in result]
+    
+    def delete_prefix(self, prefix: str) -> int:
+        """Delete everything under a prefix, deleting each listed page as it arrives"""
+        paginator = self.s3_client.get_paginator('list_objects_v2')
+        deleted = 0
+        
+        # A listing page holds at most 1000 keys, exactly one DeleteObjects batch
+        with ThreadPoolExecutor(max_workers=_S3_MAX_CONCURRENCY) as executor:
+            futures = []
+            for page in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix):
+                keys = [obj['Key'] for obj in page.get('Contents', [])]
+                if keys:
+                    futures.append(executor.submit(self._delete_batch, keys))
+                    deleted += len(keys)
+            errors = [error for future in futures for error in future.result()]
+        
+        if errors:
+            raise ClientError({'Error': errors[0]}, 'DeleteObjects')
+        return deleted
+    
+    def _delete_batch(self, paths: List[str]) -> List[dict]:
+        """Issue one DeleteObjects request and return its per-key errors"""
+        response = self.s3_client.delete_objects(
+            Bucket=self.bucket_name,
+            Delete={'Objects': [{'Key': path} for path in paths], 'Quiet': True}
+        )
+        return response.get('Errors', [])
+    
+    def _list_params(self, prefix: str) -> dict:
+        """ListObjectsV2 parameters for listing a prefix
+        
+        A prefix ending in '/' names a directory: list only its direct
+        children (like the local backend) so S3 doesn't page through nested
+        keys such as repodata/ and its backups.
+        """
+        params = {'Bucket': self.bucket_name, 'Prefix': prefix}
+        if prefix.endswith('/'):
+            params['Delimiter'] = '/'
+        return params
+    
     def list_files(self, prefix: str, suffix: Optional[str] = None) -> List[str]:
         """List files in S3 with optional suffix filter"""
         objects = []
         paginator = self.s3_client.get_paginator('list_objects_v2')
         
-        for page in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix):
+        for page in paginator.paginate(**self._list_params(prefix)):
             if 'Contents' in page:
                 for obj in page['Contents']:
                     key = obj['Key']
@@ -279,10 +498,27 @@ class S3StorageBackend(StorageBackend):
         
         return objects
     
-    def sync_from_storage(self, remote_prefix: str, local_dir: str) -> List[str]:
+    def list_file_info(self, prefix: str, suffix: Optional[str] = None) -> Dict[str, Tuple[int, str]]:
+        """List files in S3 with their size and ETag"""
+        info = {}
+        paginator = self.s3_client.get_paginator('list_objects_v2')
+        
+        for page in paginator.paginate(**self._list_params(prefix)):
+            if 'Contents' in page:
+                for obj in page['Contents']:
+                    filename = obj['Key'].split('/')[-1]
+                    if suffix is None or filename.endswith(suffix):
+                        info[filename] = (obj['Size'], obj['ETag'].strip('"'))
+        
+        return info
+    
+    def sync_from_storage(self, remote_prefix: str, local_dir: str,
+                          cache_dir: Optional[str] = None) -> List[str]:
         """Sync directory from S3 to local"""
         os.makedirs(local_dir, exist_ok=True)
-        downloaded = []
+        downloads = []
+        synced = []
+        etags = {}
         
         paginator = self.s3_client.get_paginator('list_objects_v2')
         for page in paginator.paginate(Bucket=self.bucket_name, Prefix=remote_prefix):
@@ -295,25 +531,93 @@ class S3StorageBackend(StorageBackend):
                     
                     local_file = os.path.join(local_dir, relative_path)
                     os.makedirs(os.path.dirname(local_file), exist_ok=True)
-                    self.s3_client.download_file(self.bucket_name, key, local_file)
-                    downloaded.append(relative_path)
+                    synced.append(relative_path)
+                    etags[relative_path] = obj['ETag'].strip('"')
+                    if cache_dir and self._copy_cached(cache_dir, relative_path, etags[relative_path],
+                                                       obj['Size'], local_file):
+                        continue
+                    downloads.append((key, local_file, relative_path))
         
-        return downloaded
+        # Metadata files are small, so per-request latency dominates; fetch
+        # them concurrently rather than one after another
+        self._transfer_all(
+            lambda tm: [tm.download(self.bucket_name, key, local_file) for key, local_file, _ in downloads]
+        )
+        
+        if cache_dir:
+            self._update_cache(cache_dir, local_dir, etags,
+                               [relative_path for _, _, relative_path in downloads])
+        
+        return synced
+    
+    @staticmethod
+    def _copy_cached(cache_dir: str, relative_path: str, etag: str, size: int, local_file: str) -> bool:
+        """Copy a cached download to local_file if its recorded ETag and size still match"""
+        cached = os.path.join(cache_dir, relative_path)
+        try:
+            with open(cached + '.etag') as f:
+                if f.read() != etag or os.path.getsize(cached) != size:
+                    return False
+            shutil.copyfile(cached, local_file)
+        except OSError:
+            return False
+        return True
+    
+    @staticmethod
+    def _update_cache(cache_dir: str, local_dir: str, etags: Dict[str, str], downloaded: List[str]) -> None:
+        """Store fresh downloads in the cache and drop entries no longer in storage"""
+        for relative_path in downloaded:
+            cached = os.path.join(cache_dir, relative_path)
+            os.makedirs(os.path.dirname(cached), exist_ok=True)
+            # The ETag file is written last, so a partial entry never validates
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(cached + '.etag')
+            shutil.copyfile(os.path.join(local_dir, relative_path), cached + '.tmp')
+            os.replace(cached + '.tmp', cached)
+            with open(cached + '.etag', 'w') as f:
+                f.write(etags[relative_path])
+        
+        for root, dirs, files in os.walk(cache_dir):
+            for file in files:
+                path = os.path.join(root, file)
+                relative_path = os.path.relpath(path, cache_dir)
+                if relative_path.endswith('.etag'):
+                    relative_path = relative_path[:-len('.etag')]
+                if relative_path not in etags:
+                    os.remove(path)
     
     def sync_to_storage(self, local_dir: str, remote_prefix: str) -> List[str]:
         """Sync directory from local to S3"""
         uploaded = []
         
-        for root, dirs, files in os.walk(local_dir):
-            for file in files:
-                local_path = os.path.join(root, file)
-                relative_path = os.path.relpath(local_path, local_dir)
-                s3_key = f"{remote_prefix}/{relative_path}".replace('//', '/')
-                self.s3_client.upload_file(local_path, self.bucket_name, s3_key)
-                uploaded.append(relative_path)
+        def submit(tm):
+            # Queue each upload as soon as the walk finds it, so transfers
+            # start while the rest of the tree is still being scanned
+            futures = []
+            for root, dirs, files in os.walk(local_dir):
+                for file in files:
+                    local_path = os.path.join(root, file)
+                    relative_path = os.path.relpath(local_path, local_dir)
+                    s3_key = f"{remote_prefix}/{relative_path}".replace('//', '/')
+                    futures.append(tm.upload(local_path, self.bucket_name, s3_key, extra_args=self.upload_args))
+                    uploaded.append(relative_path)
+            return futures
+        
+        self._transfer_all(submit)
         
         return uploaded
     
+    def _transfer_all(self, submit) -> None:
+        """Run a batch of transfers on one shared transfer manager
+        
+        Args:
+            submit: Callable taking the TransferManager and returning the
+                futures it queued
+        """
+        with create_transfer_manager(self.s3_client, self.bulk_transfer_config) as manager:
+            for future in submit(manager):
+                future.result()
+    
     def get_url(self) -> str:
         """Get S3 URL for display"""
         if self.endpoint_url:
@@ -325,12 +629,76 @@ class S3StorageBackend(StorageBackend):
         obj = self.s3_client.get_object(Bucket=self.bucket_name, Key=remote_path)
         return obj['Body'].read()
     
+    def stream_file(self, remote_path: str, chunk_size: int = 1 << 20) -> Iterator[bytes]:
+        """Stream file content from S3 in chunks"""
+        obj = self.s3_client.get_object(Bucket=self.bucket_name, Key=remote_path)
+        body = obj['Body']
+        try:
+            yield from body.iter_chunks(chunk_size)
+        finally:
+            body.close()
+    
+    def get_sha256(self, remote_path: str) -> Optional[str]:
+        """Get the SHA256 S3 stored for an object via HeadObject
+        
+        Multipart uploads carry a checksum-of-checksums ("<b64>-<parts>")
+        rather than a whole-object one; those, objects uploaded without a
+        checksum, and everything when backend.s3.checksum_sha256 is off,
+        return None.
+        """
+        if not self.checksum_sha256:
+            return None
+        head = self.s3_client.head_object(
+            Bucket=self.bucket_name,
+            Key=remote_path,
+            ChecksumMode='ENABLED'
+        )
+        checksum = head.get('ChecksumSHA256')
+        if not checksum or '-' in checksum or head.get('ChecksumType') == 'COMPOSITE':
+            return None
+        return base64.b64decode(checksum).hex()
+    
+    def _bucket_versioned(self) -> bool:
+        """Check (once) whether versioning is enabled on the bucket"""
+        if self._versioned is None:
+            try:
+                status = self.s3_client.get_bucket_versioning(Bucket=self.bucket_name).get('Status')
+                self._versioned = status == 'Enabled'
+            except ClientError:
+                # No s3:GetBucketVersioning permission; assume unversioned
+                self._versioned = False
+        return self._versioned
+    
+    def list_file_versions(self, prefix: str) -> Optional[Dict[str, str]]:
+        """List the latest version ID of each object on a versioned bucket"""
+        if not self._bucket_versioned():
+            return None
+        
+        versions = {}
+        paginator = self.s3_client.get_paginator('list_object_versions')
+        for page in paginator.paginate(**self._list_params(prefix)):
+            for version in page.get('Versions', []):
+                if version['IsLatest']:
+                    versions[version['Key'].split('/')[-1]] = version['VersionId']
+        
+        return versions
+    
+    def restore_file_version(self, path: str, version_id: str) -> None:
+        """Copy an earlier version of an object over the current one"""
+        self.s3_client.copy_object(
+            Bucket=self.bucket_name,
+            CopySource={'Bucket': self.bucket_name, 'Key': path, 'VersionId': version_id},
+            Key=path,
+            **self.upload_args
+        )
+    
     def copy_file(self, src_path: str, dst_path: str) -> None:
         """Copy a file within S3 (uses efficient copy_object)"""
         self.s3_client.copy_object(
             Bucket=self.bucket_name,
             CopySource={'Bucket': self.bucket_name, 'Key': src_path},
-            Key=dst_path
+            Key=dst_path,
+            **self.upload_args
         )
     
     def get_info(self) -> dict:
@@ -389,13 +757,13 @@ class LocalStorageBackend(StorageBackend):
         """Copy from 'remote' (base_path) to local working directory"""
         src = self._get_full_path(remote_path)
         os.makedirs(os.path.dirname(local_path), exist_ok=True)
-        subprocess.run(['cp', src, local_path], check=True)
+        shutil.copyfile(src, local_path)
     
     def upload_file(self, local_path: str, remote_path: str) -> None:
         """Copy from local working directory to 'remote' (base_path)"""
         dst = self._get_full_path(remote_path)
         os.makedirs(os.path.dirname(dst), exist_ok=True)
-        subprocess.run(['cp', local_path, dst], check=True)
+        shutil.copyfile(local_path, dst)
     
     def delete_file(self, path: str) -> None:
         """Delete a file from local storage"""
@@ -403,6 +771,20 @@ class LocalStorageBackend(StorageBackend):
         if os.path.exists(full_path):
             os.remove(full_path)
     
+    def delete_files(self, paths: List[str]) -> None:
+        """Delete files from local storage"""
+        for path in paths:
+            self.delete_file(path)
+    
+    def delete_prefix(self, prefix: str) -> int:
+        """Delete every file under a prefix in local storage, like an S3 prefix delete"""
+        deleted = 0
+        for dirpath, _, filenames in os.walk(self._get_full_path(prefix)):
+            for filename in filenames:
+                os.remove(os.path.join(dirpath, filename))
+                deleted += 1
+        return deleted
+    
     def list_files(self, prefix: str, suffix: Optional[str] = None) -> List[str]:
         """List files in local storage with optional suffix filter"""
         prefix_path = self._get_full_path(prefix)
@@ -423,8 +805,27 @@ class LocalStorageBackend(StorageBackend):
         
         return files
     
-    def sync_from_storage(self, remote_prefix: str, local_dir: str) -> List[str]:
-        """Copy directory from base_path to local working directory"""
+    def list_file_info(self, prefix: str, suffix: Optional[str] = None) -> Dict[str, Tuple[int, Optional[str]]]:
+        """List files in local storage with their size
+        
+        Local files have no ETag, so it is None; hashing every file here
+        would read the whole repository.
+        """
+        prefix_path = self._get_full_path(prefix)
+        if os.path.isfile(prefix_path):
+            prefix_path = os.path.dirname(prefix_path)
+        
+        return {
+            filename: (os.path.getsize(os.path.join(prefix_path, filename)), None)
+            for filename in self.list_files(prefix, suffix)
+        }
+    
+    def sync_from_storage(self, remote_prefix: str, local_dir: str,
+                          cache_dir: Optional[str] = None) -> List[str]:
+        """Copy directory from base_path to local working directory
+        
+        cache_dir is ignored; the files are already local.
+        """
         src = self._get_full_path(remote_prefix)
         os.makedirs(local_dir, exist_ok=True)
         
@@ -438,7 +839,7 @@ class LocalStorageBackend(StorageBackend):
                 relative_path = os.path.relpath(src_file, src)
                 dst_file = os.path.join(local_dir, relative_path)
                 os.makedirs(os.path.dirname(dst_file), exist_ok=True)
-                subprocess.run(['cp', src_file, dst_file], check=True)
+                shutil.copyfile(src_file, dst_file)
                 downloaded.append(relative_path)
         
         return downloaded
@@ -455,7 +856,7 @@ class LocalStorageBackend(StorageBackend):
                 relative_path = os.path.relpath(src_file, local_dir)
                 dst_file = os.path.join(dst, relative_path)
                 os.makedirs(os.path.dirname(dst_file), exist_ok=True)
-                subprocess.run(['cp', src_file, dst_file], check=True)
+                shutil.copyfile(src_file, dst_file)
                 uploaded.append(relative_path)
         
         return uploaded
@@ -470,14 +871,23 @@ class LocalStorageBackend(StorageBackend):
         with open(full_path, 'rb') as f:
             return f.read()
     
+    def stream_file(self, remote_path: str, chunk_size: int = 1 << 20) -> Iterator[bytes]:
+        """Stream file content from local storage in chunks"""
+        full_path = self._get_full_path(remote_path)
+        with open(full_path, 'rb') as f:
+            yield from iter(lambda: f.read(chunk_size), b'')
+    
     def copy_file(self, src_path: str, dst_path: str) -> None:
         """Copy a file within local storage"""
-        import shutil
         src_full = self._get_full_path(src_path)
         dst_full = self._get_full_path(dst_path)
         os.makedirs(os.path.dirname(dst_full), exist_ok=True)
         shutil.copy2(src_full, dst_full)
     
+    def restore_file_version(self, path: str, version_id: str) -> None:
+        """Local storage keeps no old versions (list_file_versions returns None)"""
+        raise ValueError(f"No version {version_id} of {path}: local storage does not keep file versions")
+    
     def get_info(self) -> dict:
         """Get local storage backend information for display"""
         return {
@@ -34,8 +34,12 @@ def config_command(args, repo_type):
     if args.list:
         print(f"Reading {config.config_file}")
         print("="*40)
-        for key, value in sorted(config.list().items()):
-            print(f"{key}={value}{'*' if key in config.track_defaults else ''}")
+        # Sort the live dict's items directly; there's no need for a copy
+        defaults = set(config.track_defaults)
+        print('\n'.join(
+            f"{key}={value}{'*' if key in defaults else ''}"
+            for key, value in sorted(config.data.items())
+        ))
         return 0
     
     elif args.unset:
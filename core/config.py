@@ -16,6 +16,12 @@ from core.constants import (
     RepoConfigFiles
 )
 
+try:
+    # Faster C JSON parser; used for loading config files only (saving uses json)
+    import orjson
+except ImportError:
+    orjson = None
+
 def load_config(args, repo_type):
     if hasattr(args, 'config') and args.config:
         config_file = args.config
@@ -58,8 +64,7 @@ def config_command(args, repo_type='rpm'):
     # Handle different operations
     if args.list:
         # List all config values
-        for key, value in sorted(config.data.items()):
-            print(f"{key}={value}")
+        print('\n'.join(f"{key}={value}" for key, value in sorted(config.data.items())))
         return 0
     
     elif args.unset:
@@ -252,8 +257,9 @@ class RepoConfig:
             return {}
         
         try:
-            with open(self.config_file, 'r') as f:
-                return json.load(f)
+            with open(self.config_file, 'rb') as f:
+                raw = f.read()
+            return orjson.loads(raw) if orjson is not None else json.loads(raw)
         except (json.JSONDecodeError, IOError) as e:
             raise ValueError(f"Failed to load config from {self.config_file}: {e}")
     
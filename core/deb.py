@@ -11,11 +11,9 @@ import argparse
 import os
 import sys
 import subprocess
-import re
-import gzip
 import bz2
 import hashlib
-import io
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
 import json
@@ -25,6 +23,16 @@ from core.backend import create_storage_backend
 from core.config import RepoConfig
 from core import Colors
 
+try:
+    # ISA-L accelerated DEFLATE; drop-in replacement for the stdlib module
+    from isal import igzip as gzip, isal_zlib
+    # igzip defaults to ISA-L level 2; Packages.gz is downloaded by every
+    # client, so always write it at the best ratio available
+    GZIP_COMPRESSLEVEL = isal_zlib.ISAL_BEST_COMPRESSION
+except ImportError:
+    import gzip
+    GZIP_COMPRESSLEVEL = 9
+
 
 class DebRepo:
     """Debian repository manager with pluggable storage backends"""
@@ -132,6 +140,10 @@ class DebRepo:
         packages_to_remove = []
         remaining_entries = {}
         
+        # 'package_version' removes one version, a bare name removes them all
+        remove_versions = {pkg_name for pkg_name in package_names if '_' in pkg_name}
+        remove_names = set(package_names) - remove_versions
+        
         with open(local_packages, 'r') as f:
             content = f.read()
         
@@ -144,18 +156,8 @@ class DebRepo:
             if line.strip() == '':
                 if current_entry and current_package:
                     # Check if this package should be removed
-                    should_remove = False
-                    for pkg_name in package_names:
-                        if '_' in pkg_name:
-                            # Format: package_version
-                            if f"{current_package}_{current_version}" == pkg_name:
-                                should_remove = True
-                                break
-                        else:
-                            # Just package name - remove all versions
-                            if current_package == pkg_name:
-                                should_remove = True
-                                break
+                    should_remove = (current_package in remove_names
+                                     or f"{current_package}_{current_version}" in remove_versions)
                     
                     if should_remove:
                         packages_to_remove.append({
@@ -193,13 +195,16 @@ class DebRepo:
         try:
             # Delete packages from pool
             print("Deleting packages from pool...")
-            for pkg_info in packages_to_remove:
-                if pkg_info['filename']:
-                    try:
-                        self.storage.delete_file(pkg_info['filename'])
-                        print(f"  ✗ {pkg_info['filename']}")
-                    except Exception as e:
-                        print(Colors.warning(f"  ⚠ Could not delete {pkg_info['filename']}: {e}"))
+            pool_files = [pkg_info['filename'] for pkg_info in packages_to_remove if pkg_info['filename']]
+            try:
+                failed = self.storage.try_delete_files(pool_files)
+                for filename in pool_files:
+                    if filename in failed:
+                        print(Colors.warning(f"  ⚠ Could not delete {filename}: {failed[filename]}"))
+                    else:
+                        print(f"  ✗ {filename}")
+            except Exception as e:
+                print(Colors.warning(f"  ⚠ Could not delete packages from pool: {e}"))
             
             # Write updated Packages file
             print("Updating metadata...")
@@ -208,13 +213,7 @@ class DebRepo:
                     f.write(remaining_entries[key])
             
             # Compress
-            with open(local_packages, 'rb') as f_in:
-                with gzip.open(local_packages + '.gz', 'wb') as f_out:
-                    f_out.write(f_in.read())
-            
-            with open(local_packages, 'rb') as f_in:
-                with bz2.open(local_packages + '.bz2', 'wb') as f_out:
-                    f_out.write(f_in.read())
+            self._compress_packages_file(local_packages)
             
             # Generate Release file
             print("Updating Release file...")
@@ -645,9 +644,8 @@ class DebRepo:
             packages_path = f"dists/{distribution}/{component}/binary-{arch}/Packages.gz"
             packages_content = self.storage.download_file_content(packages_path)
             
-            # Decompress and parse
-            with gzip.open(io.BytesIO(packages_content), 'rt', encoding='utf-8') as f:
-                content = f.read()
+            # Decompress and decode in one go rather than through a text wrapper
+            content = gzip.decompress(packages_content).decode('utf-8')
             
             # Parse Packages file (RFC 822 format)
             checksums = {}
@@ -854,9 +852,7 @@ class DebRepo:
             control_data = result.stdout
             
             # Calculate checksums
-            md5sum = self._calculate_md5(deb_file)
-            sha1sum = self._calculate_sha1(deb_file)
-            sha256sum = self._calculate_sha256(deb_file)
+            md5sum, sha1sum, sha256sum = self._calculate_digests(deb_file)
             size = os.path.getsize(deb_file)
             
             # Get pool path
@@ -880,13 +876,7 @@ class DebRepo:
                 f.write(existing_entries[key])
         
         # Compress
-        with open(existing_packages_file, 'rb') as f_in:
-            with gzip.open(existing_packages_file + '.gz', 'wb') as f_out:
-                f_out.write(f_in.read())
-        
-        with open(existing_packages_file, 'rb') as f_in:
-            with bz2.open(existing_packages_file + '.bz2', 'wb') as f_out:
-                f_out.write(f_in.read())
+        self._compress_packages_file(existing_packages_file)
     
     def _generate_packages_file(self, deb_files, distribution, component, arch, local_dir):
         """
@@ -910,9 +900,7 @@ class DebRepo:
             control_data = result.stdout
             
             # Calculate checksums
-            md5sum = self._calculate_md5(deb_file)
-            sha1sum = self._calculate_sha1(deb_file)
-            sha256sum = self._calculate_sha256(deb_file)
+            md5sum, sha1sum, sha256sum = self._calculate_digests(deb_file)
             size = os.path.getsize(deb_file)
             
             # Get pool path
@@ -933,13 +921,7 @@ class DebRepo:
             f.write(''.join(packages_content))
         
         # Compress
-        with open(packages_file, 'rb') as f_in:
-            with gzip.open(packages_file + '.gz', 'wb') as f_out:
-                f_out.write(f_in.read())
-        
-        with open(packages_file, 'rb') as f_in:
-            with bz2.open(packages_file + '.bz2', 'wb') as f_out:
-                f_out.write(f_in.read())
+        self._compress_packages_file(packages_file)
 
     def _generate_release_file(self, distribution, local_dir):
         """
@@ -978,9 +960,10 @@ class DebRepo:
             relative_path = os.path.relpath(pkg_file, dist_dir)
             size = os.path.getsize(pkg_file)
 
-            md5sums.append(f" {self._calculate_md5(pkg_file)} {size:8d} {relative_path}")
-            sha1sums.append(f" {self._calculate_sha1(pkg_file)} {size:8d} {relative_path}")
-            sha256sums.append(f" {self._calculate_sha256(pkg_file)} {size:8d} {relative_path}")
+            md5sum, sha1sum, sha256sum = self._calculate_digests(pkg_file)
+            md5sums.append(f" {md5sum} {size:8d} {relative_path}")
+            sha1sums.append(f" {sha1sum} {size:8d} {relative_path}")
+            sha256sums.append(f" {sha256sum} {size:8d} {relative_path}")
 
         # Use detected architectures if any found, otherwise fall back to configured
         architectures = sorted(architectures_found) if architectures_found else self.architectures
@@ -1047,20 +1030,14 @@ SHA256:
         print(f"Creating metadata backup...")
         
         try:
-            # Backup Packages files
-            for filename in ['Packages', 'Packages.gz', 'Packages.bz2']:
-                src = f"dists/{distribution}/{component}/binary-{arch}/{filename}"
-                dst = f"{self.backup_path}/{component}/binary-{arch}/{filename}"
-                
-                if self.storage.exists(src):
-                    self.storage.copy_file(src, dst)
-            
-            # Backup Release file
-            src = f"dists/{distribution}/Release"
-            dst = f"{self.backup_path}/Release"
-            
-            if self.storage.exists(src):
-                self.storage.copy_file(src, dst)
+            # Backup Packages files and Release file
+            copies = [
+                (f"dists/{distribution}/{component}/binary-{arch}/{filename}",
+                 f"{self.backup_path}/{component}/binary-{arch}/{filename}")
+                for filename in ['Packages', 'Packages.gz', 'Packages.bz2']
+            ]
+            copies.append((f"dists/{distribution}/Release", f"{self.backup_path}/Release"))
+            self._copy_existing(copies)
             
             print(f"  Backup created: {self.storage.get_url()}/{self.backup_path}")
         
@@ -1084,20 +1061,14 @@ SHA256:
         print(f"Restoring metadata from backup...")
         
         try:
-            # Restore Packages files
-            for filename in ['Packages', 'Packages.gz', 'Packages.bz2']:
-                src = f"{self.backup_path}/{component}/binary-{arch}/{filename}"
-                dst = f"dists/{distribution}/{component}/binary-{arch}/{filename}"
-                
-                if self.storage.exists(src):
-                    self.storage.copy_file(src, dst)
-            
-            # Restore Release file
-            src = f"{self.backup_path}/Release"
-            dst = f"dists/{distribution}/Release"
-            
-            if self.storage.exists(src):
-                self.storage.copy_file(src, dst)
+            # Restore Packages files and Release file
+            copies = [
+                (f"{self.backup_path}/{component}/binary-{arch}/{filename}",
+                 f"dists/{distribution}/{component}/binary-{arch}/{filename}")
+                for filename in ['Packages', 'Packages.gz', 'Packages.bz2']
+            ]
+            copies.append((f"{self.backup_path}/Release", f"dists/{distribution}/Release"))
+            self._copy_existing(copies)
             
             print(Colors.success("  ✓ Metadata restored from backup"))
             
@@ -1108,6 +1079,20 @@ SHA256:
             print(Colors.error(f"  ✗ Failed to restore backup: {e}"))
             print(Colors.warning(f"  Manual restoration required from: {self.storage.get_url()}/{self.backup_path}"))
     
+    def _copy_existing(self, copies):
+        """Copy files within storage concurrently, skipping missing sources
+        
+        Args:
+            copies: List of (src, dst) storage paths
+        """
+        def copy(pair):
+            src, dst = pair
+            if self.storage.exists(src):
+                self.storage.copy_file(src, dst)
+        
+        with ThreadPoolExecutor(max_workers=len(copies) or 1) as executor:
+            list(executor.map(copy, copies))
+    
     def _cleanup_backup(self):
         """Remove backup after successful operation"""
         if not self.backup_path:
@@ -1115,9 +1100,7 @@ SHA256:
         
         try:
             # Delete backup files
-            backup_files = self.storage.list_files(self.backup_path)
-            for filename in backup_files:
-                self.storage.delete_file(f"{self.backup_path}/{filename}")
+            self.storage.delete_prefix(f"{self.backup_path}/")
             
             self.backup_path = None
         
@@ -1171,7 +1154,9 @@ SHA256:
             print("  Filtering packages...")
             selected_entries = []
             replicated_packages = []
-            missing_packages = set(package_names)
+            # 'package_version' selects one version, a bare name every version
+            wanted = set(package_names)
+            missing_packages = set(wanted)
 
             current_entry = []
             current_package = None
@@ -1181,20 +1166,12 @@ SHA256:
                 if line.strip() == '':
                     if current_entry and current_package:
                         # Check if this package should be replicated
+                        versioned = f"{current_package}_{current_version}"
                         should_replicate = False
-                        for pkg_name in package_names:
-                            if '_' in pkg_name:
-                                # Format: package_version
-                                if f"{current_package}_{current_version}" == pkg_name:
-                                    should_replicate = True
-                                    missing_packages.discard(pkg_name)
-                                    break
-                            else:
-                                # Just package name - replicate this version
-                                if current_package == pkg_name:
-                                    should_replicate = True
-                                    missing_packages.discard(pkg_name)
-                                    break
+                        for pkg_name in (versioned, current_package):
+                            if pkg_name in wanted:
+                                should_replicate = True
+                                missing_packages.discard(pkg_name)
 
                         if should_replicate:
                             selected_entries.append('\n'.join(current_entry) + '\n\n')
@@ -1291,13 +1268,7 @@ SHA256:
 
             # Compress Packages file
             print("  Compressing metadata...")
-            with open(local_packages, 'rb') as f_in:
-                with gzip.open(local_packages + '.gz', 'wb') as f_out:
-                    f_out.write(f_in.read())
-
-            with open(local_packages, 'rb') as f_in:
-                with bz2.open(local_packages + '.bz2', 'wb') as f_out:
-                    f_out.write(f_in.read())
+            self._compress_packages_file(local_packages)
 
             # Generate/update Release file
             print("  Updating Release file...")
@@ -1324,28 +1295,39 @@ SHA256:
         print(Colors.success(f"\n✓ Replication complete: {self.storage.get_url()}/{dst_distribution}/{component}"))
     
     @staticmethod
-    def _calculate_md5(filepath):
-        """Calculate MD5 checksum of a file"""
-        md5 = hashlib.md5()
-        with open(filepath, 'rb') as f:
-            for chunk in iter(lambda: f.read(4096), b''):
-                md5.update(chunk)
-        return md5.hexdigest()
+    def _compress_packages_file(packages_file):
+        """Write Packages.gz and Packages.bz2 alongside a Packages file
+        
+        Both compressors are fed from a single chunked read, so the file is
+        read once and never held in memory whole.
+        """
+        with open(packages_file, 'rb') as f_in, \
+                gzip.open(packages_file + '.gz', 'wb',
+                          compresslevel=GZIP_COMPRESSLEVEL) as gz_out, \
+                bz2.open(packages_file + '.bz2', 'wb') as bz2_out:
+            for chunk in iter(lambda: f_in.read(1 << 20), b''):
+                gz_out.write(chunk)
+                bz2_out.write(chunk)
     
     @staticmethod
-    def _calculate_sha1(filepath):
-        """Calculate SHA1 checksum of a file"""
-        sha1 = hashlib.sha1()
+    def _calculate_digests(filepath, algorithms=('md5', 'sha1', 'sha256')):
+        """Calculate several checksums of a file in a single read
+        
+        Packages entries and the Release file need MD5, SHA1 and SHA256 of
+        the same file; feeding all hashers from one pass reads it once
+        instead of once per algorithm.
+        
+        Returns:
+            tuple: Hex digests in the order of ``algorithms``
+        """
+        hashers = [hashlib.new(name) for name in algorithms]
         with open(filepath, 'rb') as f:
-            for chunk in iter(lambda: f.read(4096), b''):
-                sha1.update(chunk)
-        return sha1.hexdigest()
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                for h in hashers:
+                    h.update(chunk)
+        return tuple(h.hexdigest() for h in hashers)
     
-    @staticmethod
-    def _calculate_sha256(filepath):
+    @classmethod
+    def _calculate_sha256(cls, filepath):
         """Calculate SHA256 checksum of a file"""
-        sha256 = hashlib.sha256()
-        with open(filepath, 'rb') as f:
-            for chunk in iter(lambda: f.read(4096), b''):
-                sha256.update(chunk)
-        return sha256.hexdigest()
+        return cls._calculate_digests(filepath, ('sha256',))[0]
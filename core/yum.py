@@ -8,14 +8,21 @@ Licensed under the MIT License. See LICENSE file for details.
 """
 
 import os
+import contextlib
 import subprocess
 import re
-import gzip
 import hashlib
+import mmap
+import shutil
+import sqlite3
+import tempfile
+import time
 from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
 import bz2
 
-from core.backend import create_storage_backend
+from core.backend import create_storage_backend, ClientError
 from core.config import RepoConfig
 from core.sqlite_metadata import SQLiteMetadataManager
 from core import Colors
@@ -27,6 +34,118 @@ except ImportError:
     import sys
     sys.exit(1)
 
+try:
+    # ISA-L accelerated DEFLATE; drop-in replacements for the stdlib modules
+    from isal import igzip as gzip, isal_zlib as zlib
+    # igzip defaults to ISA-L level 2; published metadata is downloaded by
+    # every client, so always write it at the best ratio available
+    GZIP_COMPRESSLEVEL = zlib.ISAL_BEST_COMPRESSION
+except ImportError:
+    import gzip
+    import zlib
+    GZIP_COMPRESSLEVEL = 9
+
+try:
+    # createrepo_c Python bindings; lets incremental adds build package
+    # metadata in-process instead of running the createrepo_c CLI
+    import createrepo_c as cr
+except ImportError:
+    cr = None
+
+
+# Filename and release patterns used for arch/EL detection
+_ARCH_RE = re.compile(r'\.(x86_64|aarch64|noarch)\.rpm$')
+_EL_RE_FN = re.compile(r'\.el(\d+)\.')
+_EL_RE_RELEASE = re.compile(r'el\d+')
+
+# Matches the '.elN.<arch>.rpm' tail of a conventionally named RPM
+_FILENAME_RE = re.compile(r'\.el(\d+)\.(?:[^.]+\.)*?(x86_64|aarch64|noarch)\.rpm$')
+
+
+# XML namespaces used by YUM repository metadata
+_NS = {
+    'repo': 'http://linux.duke.edu/metadata/repo',
+    'rpm': 'http://linux.duke.edu/metadata/rpm',
+    'common': 'http://linux.duke.edu/metadata/common',
+    'filelists': 'http://linux.duke.edu/metadata/filelists',
+    'otherdata': 'http://linux.duke.edu/metadata/other'
+}
+
+# Clark-notation prefixes (e.g. _TAGS['common'] + 'package') so lookups in
+# hot loops don't resolve namespace prefixes on every call
+_TAGS = {prefix: f'{{{uri}}}' for prefix, uri in _NS.items()}
+
+# Per-package element tags in primary.xml
+_PACKAGE_TAG = _TAGS['common'] + 'package'
+_LOCATION_TAG = _TAGS['common'] + 'location'
+_NAME_TAG = _TAGS['common'] + 'name'
+_CHECKSUM_TAG = _TAGS['common'] + 'checksum'
+_SIZE_TAG = _TAGS['common'] + 'size'
+
+# Byte-level patterns for splicing metadata documents without parsing them:
+# the root start tag (the first element tag after the prolog), namespace
+# declarations, and the root's package count
+_ROOT_START_RE = re.compile(rb'<([A-Za-z_][\w.:-]*)((?:\s[^>]*)?)>')
+_XMLNS_RE = re.compile(rb'\sxmlns(?::([\w.-]+))?="([^"]*)"')
+_PACKAGES_ATTR_RE = re.compile(rb'(\spackages=")(\d+)(")')
+# Namespace declarations leading a serialized element's start tag
+_START_XMLNS_RE = re.compile(rb'<[^\s/>]+((?:\s+xmlns(?::[\w.-]+)?="[^"]*")*)')
+
+
+# Concurrent storage requests for per-file backup/restore operations
+_STORAGE_WORKERS = 16
+
+# Read size for hashing files that cannot be memory-mapped
+_CHECKSUM_BUFFER_SIZE = 1 << 20
+
+# Repodata checksums are integrity checks, not security primitives; this lets
+# OpenSSL pick its fastest SHA256 implementation (SHA-NI / ARMv8 SHA) even on
+# FIPS-restricted builds
+_new_sha256 = partial(hashlib.sha256, usedforsecurity=False)
+
+
+def _strip_inherited_ns(package_xml, nsmap):
+    """Drop namespace declarations that the enclosing root already makes
+    
+    ET.tostring() makes a child element self-contained by repeating every
+    in-scope declaration on it. Written back inside a root declaring the same
+    namespaces, those are redundant, so remove them to get the package out as
+    it was parsed.
+    
+    Args:
+        package_xml: Serialized element (UTF-8 bytes)
+        nsmap: Namespace map of the root it will be written into
+    """
+    inherited = {(prefix.encode() if prefix else None, uri.encode()) for prefix, uri in nsmap.items()}
+    decls = _START_XMLNS_RE.match(package_xml)
+    if decls is None:
+        return package_xml
+    kept = b''.join(decl.group(0) for decl in _XMLNS_RE.finditer(decls.group(1))
+                    if (decl.group(1), decl.group(2)) not in inherited)
+    return package_xml[:decls.start(1)] + kept + package_xml[decls.end(1):]
+
+
+def _keep_unless_pkgid(removed_pkgids, package):
+    """Package filter for filelists/other: keep entries not in removed_pkgids"""
+    return package.get('pkgid') not in removed_pkgids
+
+
+class _HashingWriter:
+    """File-like sink that tracks SHA256 and size of everything written"""
+    
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.sha256 = _new_sha256()
+        self.size = 0
+    
+    def write(self, data):
+        self.sha256.update(data)
+        self.size += len(data)
+        return self.fileobj.write(data)
+    
+    def flush(self):
+        self.fileobj.flush()
+
 
 class YumRepo:
     REPO_TYPE = 'rpm'
@@ -42,7 +161,16 @@ class YumRepo:
         self.storage = create_storage_backend(config, repo_type=self.REPO_TYPE)
         self.cache_dir = os.path.expanduser(config.get('repo.cache_dir', '~/yum-repo'))
         self.backup_metadata = None
+        # {filename: version_id} of repodata when the bucket keeps versions
+        self.backup_versions = None
         self.skip_validation = not config.get('validation.enabled', True)
+        self.checksum_workers = int(config.get('repo.checksum_workers', os.cpu_count() or 1))
+        # Duplicate-check SHA256s and the MD5s computed alongside them,
+        # reused when comparing against stored copies
+        self._local_sha256 = {}
+        self._local_md5 = {}
+        # (arch, el_version) read from RPM headers, keyed by path
+        self._rpm_info = {}
     
     def add_packages(self, rpm_files):
         """
@@ -69,13 +197,29 @@ class YumRepo:
         # Prepare local directory
         self._prepare_repo_dir(repo_dir)
         
+        # List repodata once; it answers "does the repo exist" and is reused
+        # when replacing the old metadata files
+        repodata_files = self._get_repodata_inventory(repo_path)
+        
         # Check if repo exists in storage
-        if not self._repo_exists(repo_path):
+        if repodata_files is None:
             self._init_repo(rpm_files, repo_dir, repo_path)
         else:
             # Check for duplicates
             print("Checking for duplicate packages...")
-            existing_checksums = self._get_existing_package_checksums(repo_path)
+            existing_packages = self._get_existing_packages(repo_path)
+            existing_checksums = {name: info[0] for name, info in existing_packages.items()}
+            
+            self._local_sha256 = {}
+            self._local_md5 = {}
+            
+            # Only packages whose filename already exists need hashing, and a
+            # size mismatch already proves the content changed
+            rpm_checksums = self._checksum_many([
+                f for f in rpm_files
+                if os.path.basename(f) in existing_packages
+                and existing_packages[os.path.basename(f)][1] in (None, os.path.getsize(f))
+            ])
             
             # Filter out duplicates
             new_packages = []
@@ -84,10 +228,9 @@ class YumRepo:
             
             for rpm_file in rpm_files:
                 rpm_basename = os.path.basename(rpm_file)
-                rpm_checksum = self._calculate_rpm_checksum(rpm_file)
                 
                 if rpm_basename in existing_checksums:
-                    if existing_checksums[rpm_basename] == rpm_checksum:
+                    if existing_checksums[rpm_basename] == rpm_checksums.get(rpm_file):
                         # Exact duplicate - skip
                         skipped_packages.append(rpm_basename)
                         print(f"  ⊘ {rpm_basename} (already exists with same checksum)")
@@ -113,7 +256,7 @@ class YumRepo:
                 print(Colors.info(f"Updating {len(updated_packages)} package(s)"))
             
             # Only add new/updated packages
-            self._add_to_existing_repo(new_packages, repo_dir, repo_path)
+            self._add_to_existing_repo(new_packages, repo_dir, repo_path, repodata_files)
         
         # Quick validation after operation
         if not self.skip_validation:
@@ -152,9 +295,9 @@ class YumRepo:
         
         print(Colors.info("Removing packages from repository..."))
         print("Downloading metadata...")
-        self.storage.sync_from_storage(f"{repo_path}/repodata", f"{repo_dir}/repodata")
+        self._sync_repodata(repo_path, repo_dir)
         
-        rpms = self.storage.list_files(repo_path, suffix='.rpm')
+        rpms = set(self.storage.list_files(f"{repo_path}/", suffix='.rpm'))
         
         # Verify RPMs exist
         missing_count = 0
@@ -172,15 +315,17 @@ class YumRepo:
         
         try:
             print("Updating metadata...")
-            self._manipulate_metadata(repo_dir, rpm_filenames)
+            metadata_changed = self._manipulate_metadata(repo_dir, rpm_filenames)
             
             # Delete from storage
-            for rpm_filename in rpm_filenames:
-                if rpm_filename in rpms:
-                    self.storage.delete_file(f"{repo_path}/{rpm_filename}")
+            self.storage.delete_files(
+                [f"{repo_path}/{rpm_filename}" for rpm_filename in rpm_filenames if rpm_filename in rpms]
+            )
             
-            print("Uploading metadata...")
-            self.storage.sync_to_storage(f"{repo_dir}/repodata", f"{repo_path}/repodata")
+            # Stale requests leave the metadata untouched; don't re-upload it
+            if metadata_changed:
+                print("Uploading metadata...")
+                self.storage.sync_to_storage(f"{repo_dir}/repodata", f"{repo_path}/repodata")
             
             # Clean up backup on success
             self._cleanup_backup()
@@ -229,7 +374,7 @@ class YumRepo:
         
         # Download metadata
         print("Downloading metadata...")
-        self.storage.sync_from_storage(f"{repo_path}/repodata", f"{repo_dir}/repodata")
+        self._sync_repodata(repo_path, repo_dir)
         
         # Perform full validation
         return self._validate_full(repo_dir, repo_path)
@@ -240,12 +385,17 @@ class YumRepo:
         """Detect arch and EL version from filename"""
         first_rpm = rpm_filename
         
-        arch_match = re.search(r'\.(x86_64|aarch64|noarch)\.rpm$', first_rpm)
+        # Common case: one scan picks up both the EL version and the arch
+        match = _FILENAME_RE.search(first_rpm)
+        if match:
+            return match.group(2), f"el{match.group(1)}"
+        
+        arch_match = _ARCH_RE.search(first_rpm)
         if not arch_match:
             raise ValueError(f"Could not detect architecture from filename: {first_rpm}")
         arch = arch_match.group(1)
         
-        el_match = re.search(r'\.el(\d+)\.', first_rpm)
+        el_match = _EL_RE_FN.search(first_rpm)
         if not el_match:
             raise ValueError(f"Could not detect EL version from filename: {first_rpm}")
         el_version = f"el{el_match.group(1)}"
@@ -254,36 +404,62 @@ class YumRepo:
     
     def _detect_from_rpm(self, rpm_file):
         """Detect arch and EL version from RPM file"""
-        first_rpm = rpm_file
-        
-        result = subprocess.run(
-            ['rpm', '-qp', '--queryformat', '%{ARCH}', first_rpm],
-            capture_output=True, text=True
-        )
-        if result.returncode != 0 or not result.stdout:
-            raise ValueError(f"Failed to detect architecture from RPM: {first_rpm}")
-        arch = result.stdout.strip()
+        return self._detect_from_rpms([rpm_file])[rpm_file]
+    
+    def _detect_from_rpms(self, rpm_files):
+        """Detect arch and EL version for several RPM files
         
-        result = subprocess.run(
-            ['rpm', '-qp', '--queryformat', '%{RELEASE}', first_rpm],
-            capture_output=True, text=True
-        )
-        if result.returncode != 0 or not result.stdout:
-            raise ValueError(f"Failed to detect release from RPM: {first_rpm}")
-        release = result.stdout.strip()
+        A conventional '.elN.<arch>.rpm' filename is taken as authoritative;
+        only the remaining files have their headers read, with a single
+        ``rpm -qp`` invocation. Results are cached per path, so the first-RPM
+        detection and the compatibility check share work.
         
-        el_match = re.search(r'el\d+', release)
-        if not el_match:
-            raise ValueError(f"Could not determine EL version from release: {release}")
-        el_version = el_match.group(0)
+        Args:
+            rpm_files: List of paths to RPM files
         
-        return arch, el_version
+        Returns:
+            dict: {rpm_file: (arch, el_version)}
+        """
+        pending = []
+        for rpm_file in dict.fromkeys(rpm_files):
+            if rpm_file in self._rpm_info:
+                continue
+            match = _FILENAME_RE.search(os.path.basename(rpm_file))
+            if match:
+                self._rpm_info[rpm_file] = (match.group(2), f"el{match.group(1)}")
+            else:
+                pending.append(rpm_file)
+        if pending:
+            result = subprocess.run(
+                ['rpm', '-qp', '--queryformat', '%{ARCH}\t%{RELEASE}\n', *pending],
+                capture_output=True, text=True
+            )
+            lines = result.stdout.splitlines()
+            if result.returncode != 0 or len(lines) != len(pending):
+                # Can't tell which output belongs to which file; query one at
+                # a time so the error names the offending RPM
+                if len(pending) > 1:
+                    for rpm_file in pending:
+                        self._detect_from_rpms([rpm_file])
+                    return {f: self._rpm_info[f] for f in rpm_files}
+                raise ValueError(f"Failed to detect architecture from RPM: {pending[0]}")
+            
+            for rpm_file, line in zip(pending, lines):
+                arch, _, release = line.partition('\t')
+                if not arch:
+                    raise ValueError(f"Failed to detect architecture from RPM: {rpm_file}")
+                if not release:
+                    raise ValueError(f"Failed to detect release from RPM: {rpm_file}")
+                el_match = _EL_RE_RELEASE.search(release)
+                if not el_match:
+                    raise ValueError(f"Could not determine EL version from release: {release}")
+                self._rpm_info[rpm_file] = (arch, el_match.group(0))
+        
+        return {f: self._rpm_info[f] for f in rpm_files}
     
     def _validate_rpm_compatibility(self, rpm_files, expected_arch, expected_el):
         """Verify all RPMs match the same arch/version"""
-        for rpm_file in rpm_files:
-            rpm_arch, rpm_el = self._detect_from_rpm(rpm_file)
-            
+        for rpm_file, (rpm_arch, rpm_el) in self._detect_from_rpms(rpm_files).items():
             if rpm_arch != expected_arch or rpm_el != expected_el:
                 raise ValueError(
                     f"RPM mismatch: Expected {expected_el}/{expected_arch}, "
@@ -292,22 +468,109 @@ class YumRepo:
         
         print(Colors.info(f"Target: {expected_el}/{expected_arch} ({len(rpm_files)} package{'s' if len(rpm_files) > 1 else ''})"))
     
+    def _sync_repodata(self, repo_path, repo_dir):
+        """Download a repository's repodata into repo_dir/repodata
+        
+        Files are cached under <cache_dir>/.metadata-cache and only fetched
+        again when their ETag in storage changes, so repeated operations on
+        the same repository download only the files that changed.
+        """
+        return self.storage.sync_from_storage(
+            f"{repo_path}/repodata", f"{repo_dir}/repodata",
+            cache_dir=os.path.join(self.cache_dir, '.metadata-cache', repo_path, 'repodata')
+        )
+    
     def _prepare_repo_dir(self, repo_dir):
         """Clean and create fresh local repo directory"""
         if os.path.exists(repo_dir):
-            subprocess.run(['rm', '-rf', repo_dir], check=True)
+            shutil.rmtree(repo_dir)
         os.makedirs(repo_dir, exist_ok=True)
     
+    def _generate_package_metadata(self, rpm_files, temp_repo):
+        """Write primary/filelists/other metadata for rpm_files into temp_repo
+        
+        Uses the createrepo_c bindings when installed, reading each RPM header
+        in-process; otherwise stages the RPMs and runs 'createrepo_c
+        --no-database'. Either way temp_repo/repodata ends up with the three
+        XML files and a repomd.xml that _merge_metadata can read.
+        """
+        if cr is None:
+            for rpm_file in rpm_files:
+                self._stage_rpm(rpm_file, temp_repo)
+            subprocess.run(['createrepo_c', '--no-database', temp_repo], check=True,
+                          stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            return
+        
+        repodata_dir = os.path.join(temp_repo, 'repodata')
+        os.makedirs(repodata_dir, exist_ok=True)
+        paths = {t: os.path.join(repodata_dir, f'{t}.xml.gz') for t in ('primary', 'filelists', 'other')}
+        writers = [cr.PrimaryXmlFile(paths['primary']),
+                   cr.FilelistsXmlFile(paths['filelists']),
+                   cr.OtherXmlFile(paths['other'])]
+        for writer in writers:
+            writer.set_num_of_pkgs(len(rpm_files))
+        for rpm_file in rpm_files:
+            pkg = cr.package_from_rpm(rpm_file, location_href=os.path.basename(rpm_file))
+            for writer in writers:
+                writer.add_pkg(pkg)
+        for writer in writers:
+            writer.close()
+        
+        repomd = cr.Repomd()
+        for data_type, path in paths.items():
+            record = cr.RepomdRecord(data_type, path)
+            record.fill(cr.SHA256)
+            repomd.set_record(record)
+        with open(os.path.join(repodata_dir, 'repomd.xml'), 'w') as f:
+            f.write(repomd.xml_dump())
+    
+    @staticmethod
+    def _stage_rpm(rpm_file, dest_dir):
+        """Copy an RPM into a local repo directory
+        
+        Uses copy_file_range where available, which lets btrfs/xfs reflink the
+        file instead of copying its data, and falls back to shutil.copyfile.
+        """
+        dst = os.path.join(dest_dir, os.path.basename(rpm_file))
+        try:
+            with open(rpm_file, 'rb') as src, open(dst, 'wb') as out:
+                remaining = os.fstat(src.fileno()).st_size
+                while remaining > 0:
+                    copied = os.copy_file_range(src.fileno(), out.fileno(), remaining)
+                    if not copied:
+                        break
+                    remaining -= copied
+            if remaining <= 0:
+                return dst
+        except (AttributeError, OSError):
+            pass
+        shutil.copyfile(rpm_file, dst)
+        return dst
+    
     def _repo_exists(self, prefix):
         """Check if repository exists in storage"""
         return self.storage.exists(f"{prefix}/repodata/repomd.xml")
     
+    def _get_repodata_inventory(self, prefix):
+        """List repodata files in storage with a single listing
+        
+        Args:
+            prefix: Repository path in storage (e.g. 'el9/x86_64')
+        
+        Returns:
+            list: Repodata filenames, or None if the repository doesn't exist
+        """
+        files = self.storage.list_files(f"{prefix}/repodata/")
+        if 'repomd.xml' not in files:
+            return None
+        return files
+    
     def _init_repo(self, rpm_files, repo_dir, repo_path):
         """Initialize a new repository"""
         print(Colors.info("Initializing new repository..."))
         
         for rpm_file in rpm_files:
-            subprocess.run(['cp', rpm_file, repo_dir], check=True)
+            self._stage_rpm(rpm_file, repo_dir)
         
         # Create repo WITH SQLite databases (default behavior)
         subprocess.run(['createrepo_c', repo_dir], check=True, 
@@ -320,41 +583,50 @@ class YumRepo:
         for rpm_file in rpm_files:
             print(f"  • {os.path.basename(rpm_file)}")
     
-    def _add_to_existing_repo(self, rpm_files, repo_dir, repo_path):
+    def _add_to_existing_repo(self, rpm_files, repo_dir, repo_path, repodata_files=None):
         """Add packages to existing repository"""
         print(Colors.info("Updating existing repository..."))
         print("Downloading metadata...")
-        self.storage.sync_from_storage(f"{repo_path}/repodata", f"{repo_dir}/repodata")
+        self._sync_repodata(repo_path, repo_dir)
         
         # Backup metadata before making changes
         print("Creating metadata backup...")
         self._backup_metadata(repo_dir, repo_path)
         
         try:
-            temp_repo = f"{repo_dir}.new"
-            os.makedirs(temp_repo, exist_ok=True)
-            
-            for rpm_file in rpm_files:
-                subprocess.run(['cp', rpm_file, temp_repo], check=True)
-            
-            # Create metadata without SQLite databases
-            subprocess.run(['createrepo_c', '--no-database', temp_repo], check=True,
-                          stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-            
-            print("Merging metadata...")
-            self._merge_metadata(repo_dir, temp_repo, rpm_files)
-            
-            subprocess.run(['rm', '-rf', temp_repo], check=True)
+            # Fresh scratch directory per add, so files left by a failed
+            # earlier run can never collide with the new metadata
+            temp_repo = tempfile.mkdtemp(prefix=os.path.basename(repo_dir) + '.new-',
+                                         dir=os.path.dirname(repo_dir))
+            try:
+                # Create metadata for the new packages only, without SQLite databases
+                self._generate_package_metadata(rpm_files, temp_repo)
+                
+                print("Merging metadata...")
+                self._merge_metadata(repo_dir, temp_repo, rpm_files)
+            finally:
+                shutil.rmtree(temp_repo, ignore_errors=True)
             
             print("Uploading packages...")
+            stored_rpms = self.storage.list_file_info(f"{repo_path}/", suffix='.rpm')
+            to_upload = []
             for rpm_file in rpm_files:
                 rpm_basename = os.path.basename(rpm_file)
-                self.storage.upload_file(rpm_file, f"{repo_path}/{rpm_basename}")
+                if self._matches_stored_file(rpm_file, f"{repo_path}/{rpm_basename}",
+                                             stored_rpms.get(rpm_basename)):
+                    print(f"  ⊘ {rpm_basename} (already in storage - skipping upload)")
+                    continue
+                to_upload.append(rpm_file)
+            self._run_storage_tasks(
+                lambda rpm_file: self.storage.upload_file(
+                    rpm_file, f"{repo_path}/{os.path.basename(rpm_file)}"),
+                to_upload
+            )
             
             # Delete all old repodata files before uploading new ones
-            old_metadata = self.storage.list_files(f"{repo_path}/repodata")
-            for old_file in old_metadata:
-                self.storage.delete_file(f"{repo_path}/repodata/{old_file}")
+            if repodata_files is None:
+                repodata_files = self.storage.list_files(f"{repo_path}/repodata/")
+            self.storage.delete_files([f"{repo_path}/repodata/{old_file}" for old_file in repodata_files])
             
             print("Uploading metadata...")
             self.storage.sync_to_storage(f"{repo_dir}/repodata", f"{repo_path}/repodata")
@@ -372,24 +644,58 @@ class YumRepo:
             self._restore_metadata(repo_path)
             raise
     
+    def _matches_stored_file(self, local_path, stored_path, stored_info):
+        """Check if a local file is identical to a file already in storage
+        
+        Args:
+            local_path: Path to local file
+            stored_path: Path of the file in storage
+            stored_info: (size, etag) tuple from storage.list_file_info, or None
+        
+        Returns:
+            bool: True if sizes match and the local MD5 matches the ETag, or
+                  the stored file's MD5 when the backend has no ETag. Multipart
+                  uploads are compared by the SHA256 S3 stored, if any
+        """
+        if stored_info is None:
+            return False
+        
+        size, etag = stored_info
+        if os.path.getsize(local_path) != size:
+            return False
+        
+        # Multipart upload ETags ("<md5>-<parts>") are not a content MD5
+        if etag and '-' in etag:
+            stored_sha256 = self.storage.get_sha256(stored_path)
+            if stored_sha256 is None:
+                return False
+            local_sha256 = self._local_sha256.get(local_path) or self.calculate_checksum(local_path)
+            return local_sha256 == stored_sha256
+        
+        local_md5 = self._local_md5.get(local_path)
+        if local_md5 is None:
+            with open(local_path, 'rb') as f:
+                if hasattr(hashlib, 'file_digest'):
+                    md5 = hashlib.file_digest(f, 'md5')
+                else:
+                    md5 = hashlib.md5()
+                    for chunk in iter(lambda: f.read(_CHECKSUM_BUFFER_SIZE), b''):
+                        md5.update(chunk)
+            local_md5 = md5.hexdigest()
+        
+        if etag is None:
+            # Only hash the stored copy of files being added
+            md5 = hashlib.md5()
+            for chunk in self.storage.stream_file(stored_path, _CHECKSUM_BUFFER_SIZE):
+                md5.update(chunk)
+            etag = md5.hexdigest()
+        return local_md5 == etag
+    
     def _merge_metadata(self, repo_dir, temp_repo, rpm_files):
         """Merge new package metadata into existing repository metadata"""
         repodata_dir = os.path.join(repo_dir, 'repodata')
         temp_repodata_dir = os.path.join(temp_repo, 'repodata')
         
-        # Namespaces
-        NS = {
-            'repo': 'http://linux.duke.edu/metadata/repo',
-            'rpm': 'http://linux.duke.edu/metadata/rpm',
-            'common': 'http://linux.duke.edu/metadata/common',
-            'filelists': 'http://linux.duke.edu/metadata/filelists',
-            'otherdata': 'http://linux.duke.edu/metadata/other'
-        }
-        
-        # Register namespaces
-        for prefix, uri in NS.items():
-            ET.register_namespace(prefix, uri)
-        
         # Parse both repomd.xml files to find metadata files
         def get_metadata_files(repodata_path):
             repomd_path = os.path.join(repodata_path, 'repomd.xml')
@@ -398,7 +704,7 @@ class YumRepo:
             files = {}
             
             # Try with namespace first
-            data_elements = root.findall('repo:data', NS)
+            data_elements = root.findall(_TAGS['repo'] + 'data')
             if not data_elements:
                 # Try without namespace (for files we've already stripped)
                 data_elements = root.findall('data')
@@ -407,7 +713,7 @@ class YumRepo:
                 data_type = data.get('type')
                 
                 # Try with namespace first
-                location = data.find('repo:location', NS)
+                location = data.find(_TAGS['repo'] + 'location')
                 if location is None:
                     # Try without namespace
                     location = data.find('location')
@@ -419,77 +725,30 @@ class YumRepo:
         existing_files = get_metadata_files(repodata_dir)
         new_files = get_metadata_files(temp_repodata_dir)
         
-        # Merge primary.xml.gz
+        # Append the new packages to each existing metadata file. The
+        # existing files are copied through as bytes rather than parsed, so
+        # the cost depends on the number of packages added, not repo size.
+        # The three files are independent and gzip releases the GIL, so they
+        # are merged concurrently.
         existing_primary = os.path.join(repodata_dir, existing_files['primary'])
-        new_primary = os.path.join(temp_repodata_dir, new_files['primary'])
-        
-        with gzip.open(existing_primary, 'rt', encoding='utf-8') as f:
-            existing_tree = ET.parse(f)
-            existing_root = existing_tree.getroot()
-        
-        with gzip.open(new_primary, 'rt', encoding='utf-8') as f:
-            new_tree = ET.parse(f)
-            new_root = new_tree.getroot()
-        
-        # Add new packages to existing metadata
-        packages_added = 0
-        for package in new_root.findall('common:package', NS):
-            existing_root.append(package)
-            packages_added += 1
-        
-        # Update package count
-        current_count = int(existing_root.get('packages', '0'))
-        existing_root.set('packages', str(current_count + packages_added))
-        
-        # Write merged primary.xml.gz (lxml handles namespaces correctly)
-        with gzip.open(existing_primary, 'wb') as f:
-            existing_tree.write(f, encoding='utf-8', xml_declaration=True, pretty_print=False)
-        
-        # Merge filelists.xml.gz
-        if 'filelists' in existing_files and 'filelists' in new_files:
-            existing_filelists = os.path.join(repodata_dir, existing_files['filelists'])
-            new_filelists = os.path.join(temp_repodata_dir, new_files['filelists'])
-            
-            with gzip.open(existing_filelists, 'rt', encoding='utf-8') as f:
-                existing_tree = ET.parse(f)
-                existing_root = existing_tree.getroot()
-            
-            with gzip.open(new_filelists, 'rt', encoding='utf-8') as f:
-                new_tree = ET.parse(f)
-                new_root = new_tree.getroot()
-            
-            for package in new_root.findall('filelists:package', NS):
-                existing_root.append(package)
-            
-            current_count = int(existing_root.get('packages', '0'))
-            existing_root.set('packages', str(current_count + packages_added))
-            
-            # Write merged filelists.xml.gz (lxml handles namespaces correctly)
-            with gzip.open(existing_filelists, 'wb') as f:
-                existing_tree.write(f, encoding='utf-8', xml_declaration=True, pretty_print=False)
-        
-        # Merge other.xml.gz
-        if 'other' in existing_files and 'other' in new_files:
-            existing_other = os.path.join(repodata_dir, existing_files['other'])
-            new_other = os.path.join(temp_repodata_dir, new_files['other'])
-            
-            with gzip.open(existing_other, 'rt', encoding='utf-8') as f:
-                existing_tree = ET.parse(f)
-                existing_root = existing_tree.getroot()
-            
-            with gzip.open(new_other, 'rt', encoding='utf-8') as f:
-                new_tree = ET.parse(f)
-                new_root = new_tree.getroot()
-            
-            for package in new_root.findall('otherdata:package', NS):
-                existing_root.append(package)
-            
-            current_count = int(existing_root.get('packages', '0'))
-            existing_root.set('packages', str(current_count + packages_added))
-            
-            # Write merged other.xml.gz (lxml handles namespaces correctly)
-            with gzip.open(existing_other, 'wb') as f:
-                existing_tree.write(f, encoding='utf-8', xml_declaration=True, pretty_print=False)
+        merges = {}
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            for data_type, package_tag in (('primary', _PACKAGE_TAG),
+                                           ('filelists', _TAGS['filelists'] + 'package'),
+                                           ('other', _TAGS['otherdata'] + 'package')):
+                if data_type not in existing_files or data_type not in new_files:
+                    continue
+                merges[data_type] = executor.submit(
+                    self._merge_package_file,
+                    os.path.join(repodata_dir, existing_files[data_type]),
+                    os.path.join(temp_repodata_dir, new_files[data_type]),
+                    package_tag
+                )
+        file_stats = {}
+        for data_type, future in merges.items():
+            stats = future.result()
+            if stats is not None:
+                file_stats[data_type] = stats
         
         # Create SQLite databases from XML files
         print("Creating SQLite databases...")
@@ -515,20 +774,31 @@ class YumRepo:
         
         # Create and compress databases
         db_files = sqlite_mgr.create_all_databases(metadata_xml_files)
-        compressed_dbs = {}
-        for db_type, db_path in db_files.items():
-            compressed_dbs[db_type] = sqlite_mgr.compress_sqlite(db_path)
+        compressed_dbs = self._compress_databases(sqlite_mgr, db_files)
         
         # Update repomd.xml with new checksums and rename files
         repomd_path = os.path.join(repodata_dir, 'repomd.xml')
         repomd_tree = ET.parse(repomd_path)
         repomd_root = repomd_tree.getroot()
+        now_ts = str(int(time.time()))
         
         # Try with namespace first, fallback to no namespace
-        data_elements = repomd_root.findall('repo:data', NS)
+        data_elements = repomd_root.findall(_TAGS['repo'] + 'data')
         if not data_elements:
             data_elements = repomd_root.findall('data')
         
+        # Spliced files were hashed while being written; hash any others
+        # concurrently (hashing releases the GIL)
+        new_checksums = {data_type: stats['checksum'] for data_type, stats in file_stats.items()}
+        xml_paths = {
+            data_type: os.path.join(repodata_dir, existing_files[data_type])
+            for data_type in ('primary', 'filelists', 'other')
+            if data_type in existing_files and data_type not in new_checksums
+        }
+        if xml_paths:
+            with ThreadPoolExecutor(max_workers=len(xml_paths)) as executor:
+                new_checksums.update(zip(xml_paths, executor.map(self.calculate_checksum, xml_paths.values())))
+        
         for data in data_elements:
             data_type = data.get('type')
             # Skip database files - they're being recreated
@@ -540,8 +810,7 @@ class YumRepo:
             if data_type in existing_files:
                 old_filepath = os.path.join(repodata_dir, existing_files[data_type])
                 
-                # Calculate new checksum
-                new_checksum = self.calculate_checksum(old_filepath)
+                new_checksum = new_checksums[data_type]
                 
                 # Determine file extension
                 if old_filepath.endswith('.xml.gz'):
@@ -557,89 +826,126 @@ class YumRepo:
                 os.rename(old_filepath, new_filepath)
                 
                 # Update checksum element
-                checksum_elem = data.find('repo:checksum', NS)
+                checksum_elem = data.find(_TAGS['repo'] + 'checksum')
                 if checksum_elem is None:
                     checksum_elem = data.find('checksum')
                 if checksum_elem is not None:
                     checksum_elem.text = new_checksum
                 
                 # Update location
-                location_elem = data.find('repo:location', NS)
+                location_elem = data.find(_TAGS['repo'] + 'location')
                 if location_elem is None:
                     location_elem = data.find('location')
                 if location_elem is not None:
                     location_elem.set('href', f'repodata/{new_filename}')
                 
-                # Update open-checksum (for .gz files)
-                open_checksum_elem = data.find('repo:open-checksum', NS)
+                # Update open-checksum and open-size (for .gz files) from a
+                # single decompression pass
+                open_checksum_elem = data.find(_TAGS['repo'] + 'open-checksum')
                 if open_checksum_elem is None:
                     open_checksum_elem = data.find('open-checksum')
-                if open_checksum_elem is not None and new_filepath.endswith('.gz'):
+                open_size_elem = data.find(_TAGS['repo'] + 'open-size')
+                if open_size_elem is None:
+                    open_size_elem = data.find('open-size')
+                stats = file_stats.get(data_type)
+                if stats is not None:
+                    if open_checksum_elem is not None:
+                        open_checksum_elem.text = stats['open-checksum']
+                    if open_size_elem is not None:
+                        open_size_elem.text = stats['open-size']
+                elif new_filepath.endswith('.gz') and (open_checksum_elem is not None or open_size_elem is not None):
+                    sha256 = _new_sha256()
+                    open_size = 0
                     with gzip.open(new_filepath, 'rb') as f:
-                        sha256 = hashlib.sha256()
-                        for chunk in iter(lambda: f.read(4096), b''):
+                        for chunk in iter(lambda: f.read(1 << 20), b''):
                             sha256.update(chunk)
+                            open_size += len(chunk)
+                    if open_checksum_elem is not None:
                         open_checksum_elem.text = sha256.hexdigest()
+                    if open_size_elem is not None:
+                        open_size_elem.text = str(open_size)
                 
                 # Update size
-                size_elem = data.find('repo:size', NS)
+                size_elem = data.find(_TAGS['repo'] + 'size')
                 if size_elem is None:
                     size_elem = data.find('size')
                 if size_elem is not None:
-                    size_elem.text = str(os.path.getsize(new_filepath))
-                
-                # Update open-size (for .gz files)
-                open_size_elem = data.find('repo:open-size', NS)
-                if open_size_elem is None:
-                    open_size_elem = data.find('open-size')
-                if open_size_elem is not None and new_filepath.endswith('.gz'):
-                    with gzip.open(new_filepath, 'rb') as f:
-                        open_size_elem.text = str(len(f.read()))
+                    size_elem.text = stats['size'] if stats is not None else str(os.stat(new_filepath).st_size)
                 
                 # Update timestamp
-                timestamp_elem = data.find('repo:timestamp', NS)
+                timestamp_elem = data.find(_TAGS['repo'] + 'timestamp')
                 if timestamp_elem is None:
                     timestamp_elem = data.find('timestamp')
                 if timestamp_elem is not None:
-                    timestamp_elem.text = str(int(datetime.now().timestamp()))
+                    timestamp_elem.text = now_ts
         
         # Remove old SQLite database entries before adding new ones
-        for data in list(repomd_root.findall('repo:data', NS)):
-            if data.get('type', '').endswith('_db'):
-                repomd_root.remove(data)
-        
-        # Also check without namespace
-        for data in list(repomd_root.findall('data')):
-            if data.get('type', '').endswith('_db'):
-                repomd_root.remove(data)
+        self._strip_database_entries(repomd_root)
         
         # Add SQLite database entries to repomd.xml
-        for db_type, db_path in compressed_dbs.items():
-            self._add_database_to_repomd(repomd_root, repodata_dir, db_type, db_path)
+        for db_type, (db_path, open_stats) in compressed_dbs.items():
+            self._add_database_to_repomd(repomd_root, repodata_dir, db_type, db_path, now_ts, open_stats)
         
         # Update revision
-        revision_elem = repomd_root.find('repo:revision', NS)
+        revision_elem = repomd_root.find(_TAGS['repo'] + 'revision')
         if revision_elem is None:
             revision_elem = repomd_root.find('revision')
         if revision_elem is not None:
-            revision_elem.text = str(int(datetime.now().timestamp()))
+            revision_elem.text = now_ts
         
         # Write repomd.xml with proper namespaces (lxml handles this correctly)
-        with open(repomd_path, 'wb') as f:
-            repomd_tree.write(f, encoding='utf-8', xml_declaration=True, pretty_print=False)
+        self._write_repomd(repomd_root, repomd_path)
     
-    def _add_database_to_repomd(self, repomd_root, repodata_dir, db_type, db_path):
+    @staticmethod
+    def _strip_database_entries(repomd_root):
+        """Remove *_db <data> entries from repomd, namespaced or not, in one pass"""
+        stale = [
+            child for child in repomd_root
+            if child.tag in ('data', _TAGS['repo'] + 'data') and child.get('type', '').endswith('_db')
+        ]
+        for child in stale:
+            repomd_root.remove(child)
+    
+    def _compress_databases(self, sqlite_mgr, db_files):
+        """bzip2-compress SQLite databases, hashing each uncompressed file first
+        
+        Hashing the .sqlite file before compression is much cheaper than
+        decompressing the .bz2 afterwards to get its open-checksum.
+        
+        Returns:
+            dict: {db_type: (path to .sqlite.bz2, (open checksum, open size))}
+        """
+        def compress(db_path):
+            open_stats = (self.calculate_checksum(db_path), os.stat(db_path).st_size)
+            return sqlite_mgr.compress_sqlite(db_path), open_stats
+        
+        # SHA256 and bzip2 both release the GIL, so the databases are
+        # processed concurrently
+        if not db_files:
+            return {}
+        with ThreadPoolExecutor(max_workers=len(db_files)) as executor:
+            return dict(zip(db_files, executor.map(compress, db_files.values())))
+    
+    def _add_database_to_repomd(self, repomd_root, repodata_dir, db_type, db_path, timestamp=None,
+                                open_stats=None):
         """Add SQLite database entry to repomd.xml"""
         filename = os.path.basename(db_path)
         checksum = self.calculate_checksum(db_path)
-        size = os.path.getsize(db_path)
-        timestamp = int(datetime.now().timestamp())
+        size = os.stat(db_path).st_size
+        if timestamp is None:
+            timestamp = str(int(time.time()))
         
-        # Calculate checksum of uncompressed database
-        with bz2.open(db_path, 'rb') as f:
-            uncompressed_data = f.read()
-            open_checksum = hashlib.sha256(uncompressed_data).hexdigest()
-            open_size = len(uncompressed_data)
+        if open_stats is not None:
+            open_checksum, open_size = open_stats
+        else:
+            # Calculate checksum and size of uncompressed database in one pass
+            open_sha256 = _new_sha256()
+            open_size = 0
+            with bz2.open(db_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1 << 20), b''):
+                    open_sha256.update(chunk)
+                    open_size += len(chunk)
+            open_checksum = open_sha256.hexdigest()
         
         # Rename file to match checksum
         new_filename = f"{checksum}-{db_type}.sqlite.bz2"
@@ -670,21 +976,17 @@ class YumRepo:
         database_version_elem.text = '10'
     
     def _manipulate_metadata(self, repo_dir, packages_to_remove):
-        """Directly manipulate YUM metadata to remove packages"""
-        repodata_dir = os.path.join(repo_dir, 'repodata')
+        """Directly manipulate YUM metadata to remove packages
         
-        # Namespaces
-        NS = {
-            'repo': 'http://linux.duke.edu/metadata/repo',
-            'rpm': 'http://linux.duke.edu/metadata/rpm',
-            'common': 'http://linux.duke.edu/metadata/common',
-            'filelists': 'http://linux.duke.edu/metadata/filelists',
-            'otherdata': 'http://linux.duke.edu/metadata/other'
-        }
-        
-        # Register namespaces
-        for prefix, uri in NS.items():
-            ET.register_namespace(prefix, uri)
+        Returns:
+            bool: True if the metadata was rewritten, False if none of the
+                  packages were listed in it (nothing needs uploading)
+        """
+        repodata_dir = os.path.join(repo_dir, 'repodata')
+        packages_to_remove = set(packages_to_remove)
+        if not packages_to_remove:
+            print("  No packages to remove; skipping metadata rewrite")
+            return False
         
         # Parse repomd.xml to find metadata files
         repomd_path = os.path.join(repodata_dir, 'repomd.xml')
@@ -692,9 +994,9 @@ class YumRepo:
         repomd_root = repomd_tree.getroot()
         
         metadata_files = {}
-        for data in repomd_root.findall('repo:data', NS):
+        for data in repomd_root.findall(_TAGS['repo'] + 'data'):
             data_type = data.get('type')
-            location = data.find('repo:location', NS)
+            location = data.find(_TAGS['repo'] + 'location')
             if location is not None:
                 metadata_files[data_type] = location.get('href').replace('repodata/', '')
         
@@ -705,112 +1007,91 @@ class YumRepo:
             sys.exit(1)
         
         primary_path = os.path.join(repodata_dir, primary_file)
-        with gzip.open(primary_path, 'rt', encoding='utf-8') as f:
-            primary_tree = ET.parse(f)
-            primary_root = primary_tree.getroot()
-        
-        # Remove packages from primary.xml
-        packages_removed = 0
-        for package in list(primary_root.findall('common:package', NS)):
-            location = package.find('common:location', NS)
-            if location is not None:
-                href = location.get('href')
-                filename = os.path.basename(href)
-                if filename in packages_to_remove:
-                    primary_root.remove(package)
-                    packages_removed += 1
-                    print(f"  Removed {filename} from primary metadata")
-        
-        # Update package count
-        current_count = int(primary_root.get('packages', '0'))
-        primary_root.set('packages', str(current_count - packages_removed))
-        
-        # Write updated primary.xml.gz
+        
+        # Remove packages from primary.xml, remembering their pkgids so the
+        # matching filelists/other entries can be dropped exactly
+        removed_pkgids = set()
+        
+        def keep_primary(package):
+            location = package.find(_LOCATION_TAG)
+            if location is None:
+                return True
+            filename = location.get('href').rsplit('/', 1)[-1]
+            if filename not in packages_to_remove:
+                return True
+            checksum = package.find(_CHECKSUM_TAG)
+            if checksum is not None:
+                removed_pkgids.add(checksum.text)
+            print(f"  Removed {filename} from primary metadata")
+            return False
+        
         new_primary_path = primary_path + '.new'
-        with gzip.open(new_primary_path, 'wb') as f:
-            primary_tree.write(f, encoding='utf-8', xml_declaration=True)
-        os.replace(new_primary_path, primary_path)
+        file_stats = {}
+        _, removed, file_stats['primary'] = self._filter_xml_stream(
+            primary_path, new_primary_path, _PACKAGE_TAG, keep_primary)
+        if not removed:
+            # Nothing matched, so the existing metadata is already correct
+            os.remove(new_primary_path)
+            print("  No matching packages in metadata; skipping metadata rewrite")
+            return False
         
-        # Process filelists.xml.gz
+        # filelists and other only depend on the removed pkgids, so rewrite
+        # them in parallel worker processes
         filelists_file = metadata_files.get('filelists')
+        other_file = metadata_files.get('other')
+        rewrites = {}
         if filelists_file:
             filelists_path = os.path.join(repodata_dir, filelists_file)
-            with gzip.open(filelists_path, 'rt', encoding='utf-8') as f:
-                filelists_tree = ET.parse(f)
-                filelists_root = filelists_tree.getroot()
-            
-            for package in list(filelists_root.findall('filelists:package', NS)):
-                name = package.get('name')
-                for rpm in packages_to_remove:
-                    if rpm.startswith(name + '-'):
-                        filelists_root.remove(package)
-                        break
-            
-            current_count = int(filelists_root.get('packages', '0'))
-            filelists_root.set('packages', str(current_count - packages_removed))
-            
-            new_filelists_path = filelists_path + '.new'
-            with gzip.open(new_filelists_path, 'wb') as f:
-                filelists_tree.write(f, encoding='utf-8', xml_declaration=True)
-            os.replace(new_filelists_path, filelists_path)
-        
-        # Process other.xml.gz
-        other_file = metadata_files.get('other')
+            rewrites['filelists'] = (filelists_path, _TAGS['filelists'] + 'package')
         if other_file:
             other_path = os.path.join(repodata_dir, other_file)
-            with gzip.open(other_path, 'rt', encoding='utf-8') as f:
-                other_tree = ET.parse(f)
-                other_root = other_tree.getroot()
-            
-            for package in list(other_root.findall('otherdata:package', NS)):
-                name = package.get('name')
-                for rpm in packages_to_remove:
-                    if rpm.startswith(name + '-'):
-                        other_root.remove(package)
-                        break
-            
-            current_count = int(other_root.get('packages', '0'))
-            other_root.set('packages', str(current_count - packages_removed))
-            
-            new_other_path = other_path + '.new'
-            with gzip.open(new_other_path, 'wb') as f:
-                other_tree.write(f, encoding='utf-8', xml_declaration=True)
-            os.replace(new_other_path, other_path)
+            rewrites['other'] = (other_path, _TAGS['otherdata'] + 'package')
+        
+        new_paths = [primary_path] + [path for path, _ in rewrites.values()]
+        try:
+            if rewrites:
+                keep_by_pkgid = partial(_keep_unless_pkgid, removed_pkgids)
+                with ProcessPoolExecutor(max_workers=len(rewrites)) as executor:
+                    futures = {
+                        data_type: executor.submit(self._filter_xml_stream, path, path + '.new', package_tag, keep_by_pkgid)
+                        for data_type, (path, package_tag) in rewrites.items()
+                    }
+                    for data_type, future in futures.items():
+                        _, _, file_stats[data_type] = future.result()
+        except Exception:
+            for path in new_paths:
+                if os.path.exists(path + '.new'):
+                    os.remove(path + '.new')
+            raise
         
-        # Update repomd.xml with new checksums and timestamps
-        for data in repomd_root.findall('repo:data', NS):
+        # Only swap files in once every rewrite has succeeded, so a failure
+        # never leaves primary out of step with filelists/other
+        for path in new_paths:
+            os.replace(path + '.new', path)
+        
+        now_ts = str(int(time.time()))
+        
+        # Update repomd.xml with the checksums and sizes recorded while
+        # writing each file, and new timestamps
+        for data in repomd_root.findall(_TAGS['repo'] + 'data'):
             data_type = data.get('type')
-            if data_type in metadata_files:
-                filepath = os.path.join(repodata_dir, metadata_files[data_type])
-                
-                # Update checksum
-                checksum_elem = data.find('repo:checksum', NS)
-                if checksum_elem is not None:
-                    checksum_elem.text = self.calculate_checksum(filepath)
-                
-                # Update size
-                size_elem = data.find('repo:size', NS)
-                if size_elem is not None:
-                    size_elem.text = str(os.path.getsize(filepath))
+            if data_type in file_stats:
+                for field, value in file_stats[data_type].items():
+                    field_elem = data.find(_TAGS['repo'] + field)
+                    if field_elem is not None:
+                        field_elem.text = value
                 
                 # Update timestamp
-                timestamp_elem = data.find('repo:timestamp', NS)
+                timestamp_elem = data.find(_TAGS['repo'] + 'timestamp')
                 if timestamp_elem is not None:
-                    timestamp_elem.text = str(int(datetime.now().timestamp()))
+                    timestamp_elem.text = now_ts
         
         # Create SQLite databases from updated XML files
         print("  Creating SQLite databases...")
         sqlite_mgr = SQLiteMetadataManager(repodata_dir)
         
         # Remove old SQLite databases from repomd.xml
-        for data in list(repomd_root.findall('repo:data', NS)):
-            if data.get('type', '').endswith('_db'):
-                repomd_root.remove(data)
-        
-        # Also check without namespace
-        for data in list(repomd_root.findall('data')):
-            if data.get('type', '').endswith('_db'):
-                repomd_root.remove(data)
+        self._strip_database_entries(repomd_root)
         
         # Build metadata file dict
         metadata_xml_files = {}
@@ -823,24 +1104,22 @@ class YumRepo:
         
         # Create and compress databases
         db_files = sqlite_mgr.create_all_databases(metadata_xml_files)
-        compressed_dbs = {}
-        for db_type, db_path in db_files.items():
-            compressed_dbs[db_type] = sqlite_mgr.compress_sqlite(db_path)
+        compressed_dbs = self._compress_databases(sqlite_mgr, db_files)
         
         # Add SQLite database entries to repomd.xml
-        for db_type, db_path in compressed_dbs.items():
-            self._add_database_to_repomd(repomd_root, repodata_dir, db_type, db_path)
+        for db_type, (db_path, open_stats) in compressed_dbs.items():
+            self._add_database_to_repomd(repomd_root, repodata_dir, db_type, db_path, now_ts, open_stats)
         
         # Update repomd.xml revision
-        revision_elem = repomd_root.find('repo:revision', NS)
+        revision_elem = repomd_root.find(_TAGS['repo'] + 'revision')
         if revision_elem is None:
             revision_elem = repomd_root.find('revision')
         if revision_elem is not None:
-            revision_elem.text = str(int(datetime.now().timestamp()))
+            revision_elem.text = now_ts
         
         # Write updated repomd.xml with proper namespaces (lxml handles this correctly)
-        with open(repomd_path, 'wb') as f:
-            repomd_tree.write(f, encoding='utf-8', xml_declaration=True, pretty_print=False)
+        self._write_repomd(repomd_root, repomd_path)
+        return True
         
     def _validate_quick(self, repo_path):
         """
@@ -860,11 +1139,10 @@ class YumRepo:
             
             # Check each metadata file
             issues = []
-            data_elements = root.findall('data')
+            data_elements = root.findall(_TAGS['repo'] + 'data')
             if not data_elements:
-                # Try with namespace
-                NS = {'repo': 'http://linux.duke.edu/metadata/repo'}
-                data_elements = root.findall('repo:data', NS)
+                # Try without namespace
+                data_elements = root.findall('data')
             
             # Check for duplicate data types
             data_types = {}
@@ -882,10 +1160,9 @@ class YumRepo:
                 data_type = data.get('type')
                 
                 # Get checksum from repomd.xml
-                checksum_elem = data.find('checksum')
+                checksum_elem = data.find(_TAGS['repo'] + 'checksum')
                 if checksum_elem is None:
-                    NS = {'repo': 'http://linux.duke.edu/metadata/repo'}
-                    checksum_elem = data.find('repo:checksum', NS)
+                    checksum_elem = data.find('checksum')
                 
                 if checksum_elem is None:
                     continue
@@ -893,10 +1170,9 @@ class YumRepo:
                 expected_checksum = checksum_elem.text
                 
                 # Get location
-                location_elem = data.find('location')
+                location_elem = data.find(_TAGS['repo'] + 'location')
                 if location_elem is None:
-                    NS = {'repo': 'http://linux.duke.edu/metadata/repo'}
-                    location_elem = data.find('repo:location', NS)
+                    location_elem = data.find('location')
                 
                 if location_elem is None:
                     continue
@@ -904,60 +1180,38 @@ class YumRepo:
                 file_path = location_elem.get('href').replace('repodata/', '')
                 file_key = f"{repo_path}/repodata/{file_path}"
                 
-                # Save primary location for later check
-                if data_type == 'primary':
-                    primary_location = file_key
-                
-                # Download and calculate checksum
+                # Stream the file and calculate checksum; primary.xml is
+                # parsed from the same stream for the RPM consistency check
                 try:
-                    file_content = self.storage.download_file_content(file_key)
-                    
-                    sha256 = hashlib.sha256()
-                    sha256.update(file_content)
-                    actual_checksum = sha256.hexdigest()
+                    if data_type == 'primary':
+                        actual_checksum, metadata_rpms, xml_package_names = self._scan_primary_stream(file_key)
+                        primary_location = file_key
+                    else:
+                        # A matching checksum stored by the backend at upload
+                        # time saves the download; anything else is settled by
+                        # hashing the file itself
+                        actual_checksum = None
+                        if checksum_elem.get('type', 'sha256') == 'sha256':
+                            actual_checksum = self.storage.get_sha256(file_key)
+                        if actual_checksum != expected_checksum:
+                            actual_checksum = self._stream_checksum(file_key)
                     
                     if actual_checksum != expected_checksum:
                         issues.append(f"Checksum mismatch for {data_type}: expected {expected_checksum[:8]}..., got {actual_checksum[:8]}...")
                 
-                except ClientError as e:
+                except (ClientError, FileNotFoundError) as e:
                     issues.append(f"Missing file: {file_key}")
             
             # Additional check: verify RPMs are listed in primary.xml
             if primary_location:
                 try:
-                    # Download and parse primary.xml
-                    primary_content = self.storage.download_file_content(primary_location)
-                    
-                    # Decompress if gzipped
-                    if primary_location.endswith('.gz'):
-                        primary_content = gzip.decompress(primary_content)
-                    
-                    # Parse XML
-                    primary_root = ET.fromstring(primary_content)
-                    
-                    # Get list of packages in metadata
-                    NS = {'common': 'http://linux.duke.edu/metadata/common'}
-                    packages = primary_root.findall('common:package', NS)
-                    if not packages:
-                        packages = primary_root.findall('package')
-                    
-                    metadata_rpms = set()
-                    for package in packages:
-                        location = package.find('common:location', NS)
-                        if location is None:
-                            location = package.find('location')
-                        if location is not None:
-                            href = location.get('href')
-                            filename = os.path.basename(href)
-                            metadata_rpms.add(filename)
-                    
                     print(f"  Found {len(metadata_rpms)} packages in primary.xml")
                     if len(metadata_rpms) <= 10:
                         for rpm in sorted(metadata_rpms):
                             print(f"    - {rpm}")
                     
                     # Get list of RPMs in storage
-                    rpms = set(self.storage.list_files(repo_path, suffix='.rpm'))
+                    rpms = set(self.storage.list_files(f"{repo_path}/", suffix='.rpm'))
                     
                     # Check for RPMs in storage but not in metadata
                     orphaned = rpms - metadata_rpms
@@ -976,45 +1230,24 @@ class YumRepo:
                     primary_db_file = None
                     for data in data_elements:
                         if data.get('type') == 'primary_db':
-                            location = data.find('location')
+                            location = data.find(_TAGS['repo'] + 'location')
                             if location is None:
-                                NS_REPO = {'repo': 'http://linux.duke.edu/metadata/repo'}
-                                location = data.find('repo:location', NS_REPO)
+                                location = data.find('location')
                             if location is not None:
                                 primary_db_file = location.get('href').replace('repodata/', '')
                                 break
                     
                     if primary_db_file:
                         try:
-                            import tempfile
-                            import sqlite3
-                            import bz2
-                            
-                            # Download primary_db
+                            # Stream primary_db to a scratch file and open it there
                             db_path = f"{repo_path}/repodata/{primary_db_file}"
-                            db_compressed = self.storage.download_file_content(db_path)
-                            
-                            # Decompress
-                            db_data = bz2.decompress(db_compressed)
-                            
-                            # Write to temp file and query
-                            with tempfile.NamedTemporaryFile(delete=False) as tmp:
-                                tmp.write(db_data)
-                                tmp_path = tmp.name
-                            
-                            try:
-                                conn = sqlite3.connect(tmp_path)
-                                cursor = conn.cursor()
-                                
-                                # Count packages in database
-                                cursor.execute("SELECT COUNT(*) FROM packages")
-                                db_count = cursor.fetchone()[0]
-                                
-                                # Get package names
-                                cursor.execute("SELECT name FROM packages")
-                                db_packages = set([row[0] for row in cursor.fetchall()])
-                                
-                                conn.close()
+                            with self._open_bz2_sqlite(self.storage.stream_file(db_path)) as conn:
+                                # Count packages and collect names in one scan
+                                db_count = 0
+                                db_packages = set()
+                                for (name,) in conn.execute("SELECT name FROM packages"):
+                                    db_count += 1
+                                    db_packages.add(name)
                                 
                                 print(f"  Found {db_count} packages in primary_db.sqlite")
                                 if db_count <= 10:
@@ -1022,14 +1255,6 @@ class YumRepo:
                                         print(f"    - {pkg}")
                                 
                                 # Compare XML vs SQLite
-                                xml_package_names = set()
-                                for package in packages:
-                                    name_elem = package.find('common:name', NS)
-                                    if name_elem is None:
-                                        name_elem = package.find('name')
-                                    if name_elem is not None:
-                                        xml_package_names.add(name_elem.text)
-                                
                                 if xml_package_names != db_packages:
                                     issues.append(f"SQLite database mismatch: XML has {len(xml_package_names)} packages, SQLite has {db_count}")
                                     missing_in_db = xml_package_names - db_packages
@@ -1046,9 +1271,6 @@ class YumRepo:
                                             issues.append(f"... and {len(extra_in_db) - 5} more extra packages in SQLite")
                                 else:
                                     print(f"  ✓ SQLite database matches XML ({db_count} packages)")
-                                
-                            finally:
-                                os.unlink(tmp_path)
                         
                         except Exception as e:
                             issues.append(f"Failed to validate SQLite database: {e}")
@@ -1069,6 +1291,82 @@ class YumRepo:
             print(Colors.error(f"  ✗ Validation error: {e}"))
             return False
     
+    def _stream_checksum(self, file_key):
+        """Calculate SHA256 of a file in storage without buffering it in memory"""
+        sha256 = _new_sha256()
+        for chunk in self.storage.stream_file(file_key):
+            sha256.update(chunk)
+        return sha256.hexdigest()
+    
+    def _scan_primary_stream(self, file_key):
+        """Checksum and parse primary.xml(.gz) from storage in a single pass
+        
+        The compressed stream is hashed, decompressed and fed to a pull
+        parser chunk by chunk, so memory use is independent of file size.
+        
+        Args:
+            file_key: Path to primary metadata file in storage
+        
+        Returns:
+            tuple: (sha256 of the stored file, set of RPM filenames,
+                    set of package names)
+        """
+        sha256 = _new_sha256()
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS) if file_key.endswith('.gz') else None
+        parser = ET.XMLPullParser(events=('end',), tag='{*}package')
+        filenames = set()
+        names = set()
+        
+        def collect():
+            for _, package in parser.read_events():
+                location = package.find('{*}location')
+                if location is not None:
+                    filenames.add(location.get('href').rsplit('/', 1)[-1])
+                name_elem = package.find('{*}name')
+                if name_elem is not None:
+                    names.add(name_elem.text)
+                package.clear(keep_tail=True)
+                while package.getprevious() is not None:
+                    del package.getparent()[0]
+        
+        for chunk in self.storage.stream_file(file_key):
+            sha256.update(chunk)
+            parser.feed(decompressor.decompress(chunk) if decompressor else chunk)
+            collect()
+        if decompressor:
+            parser.feed(decompressor.flush())
+        parser.close()
+        collect()
+        
+        return sha256.hexdigest(), filenames, names
+    
+    @staticmethod
+    @contextlib.contextmanager
+    def _open_bz2_sqlite(chunks):
+        """Open a bz2-compressed SQLite database read-only
+        
+        The compressed data is decompressed chunk by chunk into a temporary
+        file, so neither the compressed nor the decompressed image is held
+        in memory.
+        
+        Args:
+            chunks: Iterable of compressed bytes, e.g. storage.stream_file()
+        
+        Yields:
+            sqlite3.Connection: Read-only connection, closed on exit
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db_file = os.path.join(tmp_dir, 'db.sqlite')
+            decompressor = bz2.BZ2Decompressor()
+            with open(db_file, 'wb') as out:
+                for chunk in chunks:
+                    out.write(decompressor.decompress(chunk))
+            conn = sqlite3.connect(f"file:{db_file}?mode=ro", uri=True)
+            try:
+                yield conn
+            finally:
+                conn.close()
+    
     def _validate_full(self, repo_dir, repo_path):
         """
         Full validation: checksums, consistency, and client compatibility
@@ -1087,28 +1385,37 @@ class YumRepo:
             print(Colors.error("  ✗ repomd.xml not found"))
             return False
         
+        # Read once; the same bytes are parsed and scanned below
+        with open(repomd_path, 'rb') as f:
+            content = f.read()
+        
         try:
-            tree = ET.parse(repomd_path)
-            root = tree.getroot()
+            root = ET.fromstring(content)
         except ET.ParseError as e:
             print(Colors.error(f"  ✗ Failed to parse repomd.xml: {e}"))
             return False
         
         # Check for namespace prefixes (DNF incompatibility)
-        with open(repomd_path, 'r') as f:
-            content = f.read()
-            if '<repo:' in content or '<rpm:' in content:
-                issues.append("repomd.xml contains namespace prefixes (DNF incompatible)")
+        if b'<repo:' in content or b'<rpm:' in content:
+            issues.append("repomd.xml contains namespace prefixes (DNF incompatible)")
         
         # Get metadata files
-        data_elements = root.findall('data')
+        data_elements = root.findall(_TAGS['repo'] + 'data')
+        if not data_elements:
+            data_elements = root.findall('data')
         metadata_files = {}
         
         for data in data_elements:
             data_type = data.get('type')
-            location = data.find('location')
-            checksum_elem = data.find('checksum')
-            size_elem = data.find('size')
+            location = data.find(_TAGS['repo'] + 'location')
+            if location is None:
+                location = data.find('location')
+            checksum_elem = data.find(_TAGS['repo'] + 'checksum')
+            if checksum_elem is None:
+                checksum_elem = data.find('checksum')
+            size_elem = data.find(_TAGS['repo'] + 'size')
+            if size_elem is None:
+                size_elem = data.find('size')
             
             if location is not None and checksum_elem is not None:
                 filename = location.get('href').replace('repodata/', '')
@@ -1125,6 +1432,7 @@ class YumRepo:
                 issues.append(f"Missing required metadata: {req}")
         
         # Verify checksums and sizes
+        present = {}
         for data_type, info in metadata_files.items():
             filepath = os.path.join(repo_dir, 'repodata', info['filename'])
             
@@ -1137,10 +1445,15 @@ class YumRepo:
             if info['size'] and actual_size != info['size']:
                 issues.append(f"Size mismatch for {data_type}: expected {info['size']}, got {actual_size}")
             
-            # Check checksum
-            actual_checksum = self.calculate_checksum(filepath)
-            if actual_checksum != info['checksum']:
-                issues.append(f"Checksum mismatch for {data_type}")
+            present[data_type] = filepath
+        
+        # Hash all metadata files concurrently; hashing releases the GIL
+        if present:
+            with ThreadPoolExecutor(max_workers=len(present)) as executor:
+                actual_checksums = dict(zip(present, executor.map(self.calculate_checksum, present.values())))
+            for data_type, actual_checksum in actual_checksums.items():
+                if actual_checksum != metadata_files[data_type]['checksum']:
+                    issues.append(f"Checksum mismatch for {data_type}")
         
         if issues:
             for issue in issues:
@@ -1152,7 +1465,7 @@ class YumRepo:
         print(Colors.bold("2. Checking repository consistency..."))
         
         # Get list of RPMs from storage
-        rpms = set(self.storage.list_files(repo_path, suffix='.rpm'))
+        rpms = set(self.storage.list_files(f"{repo_path}/", suffix='.rpm'))
         
         # Parse primary.xml to get packages in metadata
         primary_file = metadata_files.get('primary', {}).get('filename')
@@ -1160,42 +1473,37 @@ class YumRepo:
             primary_path = os.path.join(repo_dir, 'repodata', primary_file)
             
             try:
-                with gzip.open(primary_path, 'rt', encoding='utf-8') as f:
-                    primary_tree = ET.parse(f)
-                    primary_root = primary_tree.getroot()
-                
-                # Try with namespace
-                NS = {'common': 'http://linux.duke.edu/metadata/common'}
-                packages = primary_root.findall('common:package', NS)
-                if not packages:
-                    packages = primary_root.findall('package')
-                
+                # Stream the packages, collecting filenames and a count;
+                # each element is cleared once handled
                 metadata_rpms = set()
-                for package in packages:
-                    location = package.find('common:location', NS)
-                    if location is None:
-                        location = package.find('location')
-                    
-                    if location is not None:
-                        href = location.get('href')
-                        filename = os.path.basename(href)
-                        metadata_rpms.add(filename)
+                actual_count = 0
+                with gzip.open(primary_path, 'rb') as f:
+                    context = ET.iterparse(f, events=('end',), tag=(_PACKAGE_TAG, 'package'))
+                    for _, package in context:
+                        location = package.find(_LOCATION_TAG)
+                        if location is None:
+                            location = package.find('location')
+                        if location is not None:
+                            metadata_rpms.add(location.get('href').rsplit('/', 1)[-1])
+                        actual_count += 1
+                        package.clear(keep_tail=True)
+                        while package.getprevious() is not None:
+                            del package.getparent()[0]
+                    declared_count = int(context.root.get('packages', '0'))
                 
                 # Check for orphaned RPMs (in S3 but not in metadata)
-                orphaned = rpms - metadata_rpms
+                orphaned = rpms.difference(metadata_rpms)
                 if orphaned:
                     for rpm in sorted(orphaned):
                         warnings.append(f"Orphaned RPM in S3: {rpm}")
                 
                 # Check for missing RPMs (in metadata but not in S3)
-                missing = metadata_rpms - rpms
+                missing = metadata_rpms.difference(rpms)
                 if missing:
                     for rpm in sorted(missing):
                         issues.append(f"Missing RPM from S3: {rpm}")
                 
                 # Check package count
-                declared_count = int(primary_root.get('packages', '0'))
-                actual_count = len(packages)
                 if declared_count != actual_count:
                     issues.append(f"Package count mismatch: declared {declared_count}, found {actual_count}")
                 
@@ -1228,19 +1536,8 @@ class YumRepo:
                 
                 # Verify database can be opened
                 try:
-                    # Decompress and check
-                    with bz2.open(db_path, 'rb') as f:
-                        db_data = f.read()
-                    
-                    # Try to open as SQLite
-                    import tempfile
-                    with tempfile.NamedTemporaryFile(delete=False) as tmp:
-                        tmp.write(db_data)
-                        tmp_path = tmp.name
-                    
-                    try:
-                        import sqlite3
-                        conn = sqlite3.connect(tmp_path)
+                    with open(db_path, 'rb') as f, \
+                            self._open_bz2_sqlite(iter(lambda: f.read(_CHECKSUM_BUFFER_SIZE), b'')) as conn:
                         cursor = conn.cursor()
                         
                         # Check db_info table exists
@@ -1261,10 +1558,6 @@ class YumRepo:
                             if primary_file and db_type == 'primary_db':
                                 if db_count != actual_count:
                                     issues.append(f"{db_type}: package count mismatch (DB: {db_count}, XML: {actual_count})")
-                        
-                        conn.close()
-                    finally:
-                        os.unlink(tmp_path)
                     
                 except Exception as e:
                     issues.append(f"{db_type}: failed to validate - {e}")
@@ -1305,13 +1598,22 @@ class YumRepo:
             print(Colors.warning("  ⚠ No local metadata to backup"))
             return
         
-        backed_up_count = 0
-        for filename in os.listdir(repodata_dir):
-            local_file = os.path.join(repodata_dir, filename)
-            if os.path.isfile(local_file):
-                dest_path = f"{backup_prefix}/{filename}"
-                self.storage.upload_file(local_file, dest_path)
-                backed_up_count += 1
+        # A versioned bucket already keeps every overwritten object, so
+        # recording the current versions is backup enough
+        versions = self.storage.list_file_versions(f"{repo_path}/repodata/")
+        if versions:
+            self.backup_versions = versions
+            print(f"  Backup recorded: {len(versions)} object versions in {self.storage.get_url()}/{repo_path}/repodata")
+            return
+        
+        filenames = [f for f in os.listdir(repodata_dir)
+                     if os.path.isfile(os.path.join(repodata_dir, f))]
+        self._run_storage_tasks(
+            lambda filename: self.storage.upload_file(
+                os.path.join(repodata_dir, filename), f"{backup_prefix}/{filename}"),
+            filenames
+        )
+        backed_up_count = len(filenames)
         
         # Store backup location for potential restoration
         self.backup_metadata = backup_prefix
@@ -1319,22 +1621,26 @@ class YumRepo:
     
     def _restore_metadata(self, repo_path):
         """Restore metadata from backup after a failed operation"""
+        if self.backup_versions:
+            self._restore_metadata_versions(repo_path)
+            return
+        
         if not self.backup_metadata:
             print(Colors.error("  No backup available to restore"))
             return
         
         try:
             # Delete current (corrupted) metadata
-            current_files = self.storage.list_files(f"{repo_path}/repodata")
-            for filename in current_files:
-                self.storage.delete_file(f"{repo_path}/repodata/{filename}")
+            current_files = self.storage.list_files(f"{repo_path}/repodata/")
+            self.storage.delete_files([f"{repo_path}/repodata/{filename}" for filename in current_files])
             
             # Restore from backup
-            backup_files = self.storage.list_files(self.backup_metadata)
-            for filename in backup_files:
-                source_path = f"{self.backup_metadata}/{filename}"
-                dest_path = f"{repo_path}/repodata/{filename}"
-                self.storage.copy_file(source_path, dest_path)
+            backup_files = self.storage.list_files(f"{self.backup_metadata}/")
+            self._run_storage_tasks(
+                lambda filename: self.storage.copy_file(
+                    f"{self.backup_metadata}/{filename}", f"{repo_path}/repodata/{filename}"),
+                backup_files
+            )
             
             print(Colors.success("  ✓ Metadata restored from backup"))
             
@@ -1345,16 +1651,42 @@ class YumRepo:
             print(Colors.error(f"  ✗ Failed to restore backup: {e}"))
             print(Colors.warning(f"  Manual restoration required from: {self.storage.get_url()}/{self.backup_metadata}"))
     
+    def _restore_metadata_versions(self, repo_path):
+        """Roll repodata back to the object versions recorded by _backup_metadata"""
+        versions = self.backup_versions
+        try:
+            # Delete files the failed operation added, then bring back the
+            # recorded version of every file it changed or deleted
+            current = self.storage.list_file_versions(f"{repo_path}/repodata/") or {}
+            self.storage.delete_files([f"{repo_path}/repodata/{filename}"
+                                       for filename in current if filename not in versions])
+            changed = [filename for filename, version_id in versions.items()
+                       if current.get(filename) != version_id]
+            self._run_storage_tasks(
+                lambda filename: self.storage.restore_file_version(
+                    f"{repo_path}/repodata/{filename}", versions[filename]),
+                changed
+            )
+            
+            print(Colors.success("  ✓ Metadata restored from previous object versions"))
+            
+        except Exception as e:
+            print(Colors.error(f"  ✗ Failed to restore backup: {e}"))
+            print(Colors.warning("  Manual restoration required from these object versions:"))
+            for filename, version_id in sorted(versions.items()):
+                print(f"    {repo_path}/repodata/{filename} {version_id}")
+    
     def _cleanup_backup(self):
         """Remove backup after successful operation"""
+        # Recorded versions are just references; nothing to delete
+        self.backup_versions = None
+        
         if not self.backup_metadata:
             return
         
         try:
             # Delete backup files
-            backup_files = self.storage.list_files(self.backup_metadata)
-            for filename in backup_files:
-                self.storage.delete_file(f"{self.backup_metadata}/{filename}")
+            self.storage.delete_prefix(f"{self.backup_metadata}/")
             
             self.backup_metadata = None
             
@@ -1363,6 +1695,19 @@ class YumRepo:
             print(Colors.warning(f"  ⚠ Failed to clean up backup: {e}"))
             print(Colors.info(f"  Backup retained at: {self.storage.get_url()}/{self.backup_metadata}"))
     
+    def _run_storage_tasks(self, func, items):
+        """Apply func to each item on a thread pool
+        
+        Storage calls are dominated by request latency, so overlapping them
+        is much faster than issuing them one after another. Any exception
+        raised by func is re-raised here.
+        """
+        items = list(items)
+        if len(items) <= 1:
+            return [func(item) for item in items]
+        with ThreadPoolExecutor(max_workers=min(_STORAGE_WORKERS, len(items))) as executor:
+            return list(executor.map(func, items))
+    
     def _get_existing_package_checksums(self, repo_path):
         """Get checksums of all packages in repository
         
@@ -1372,6 +1717,17 @@ class YumRepo:
         Returns:
             dict: {rpm_filename: checksum}
         """
+        return {name: info[0] for name, info in self._get_existing_packages(repo_path).items()}
+    
+    def _get_existing_packages(self, repo_path):
+        """Get checksums and file sizes of all packages in repository
+        
+        Args:
+            repo_path: Repository path (e.g., "el9/x86_64")
+        
+        Returns:
+            dict: {rpm_filename: (checksum, package size or None)}
+        """
         import io
         
         try:
@@ -1380,13 +1736,12 @@ class YumRepo:
             repomd_tree = ET.fromstring(repomd_content)
             
             # Find primary data location
-            NS = {'repo': 'http://linux.duke.edu/metadata/repo'}
             primary_location = None
             
             # Try with namespace
-            for data in repomd_tree.findall('repo:data', NS):
+            for data in repomd_tree.findall(_TAGS['repo'] + 'data'):
                 if data.get('type') == 'primary':
-                    location = data.find('repo:location', NS)
+                    location = data.find(_TAGS['repo'] + 'location')
                     if location is not None:
                         primary_location = location.get('href')
                         break
@@ -1407,37 +1762,31 @@ class YumRepo:
             primary_path = primary_location.replace('repodata/', '')
             primary_content = self.storage.download_file_content(f"{repo_path}/repodata/{primary_path}")
             
-            # Parse and extract checksums
-            with gzip.open(io.BytesIO(primary_content), 'rt', encoding='utf-8') as f:
-                tree = ET.parse(f)
-                root = tree.getroot()
-            
+            # Stream the packages and extract checksums
             checksums = {}
-            
-            # Try with namespace first
-            NS = {'common': 'http://linux.duke.edu/metadata/common'}
-            packages = root.findall('.//{http://linux.duke.edu/metadata/common}package')
-            
-            if not packages:
-                # Try without namespace
-                packages = root.findall('.//package')
-            
-            for package in packages:
-                # Get location (filename)
-                location_elem = package.find('.//{http://linux.duke.edu/metadata/common}location')
-                if location_elem is None:
-                    location_elem = package.find('.//location')
-                
-                # Get checksum
-                checksum_elem = package.find('.//{http://linux.duke.edu/metadata/common}checksum')
-                if checksum_elem is None:
-                    checksum_elem = package.find('.//checksum')
-                
-                if location_elem is not None and checksum_elem is not None:
-                    href = location_elem.get('href')
-                    if href:
-                        filename = os.path.basename(href)
-                        checksums[filename] = checksum_elem.text
+            with gzip.open(io.BytesIO(primary_content), 'rb') as f:
+                for package in self._iter_primary_packages(f):
+                    # Get location (filename)
+                    location_elem = package.find(_LOCATION_TAG)
+                    if location_elem is None:
+                        location_elem = package.find('location')
+                    
+                    # Get checksum
+                    checksum_elem = package.find(_CHECKSUM_TAG)
+                    if checksum_elem is None:
+                        checksum_elem = package.find('checksum')
+                    
+                    # Get package file size
+                    size_elem = package.find(_SIZE_TAG)
+                    if size_elem is None:
+                        size_elem = package.find('size')
+                    size = size_elem.get('package') if size_elem is not None else None
+                    
+                    if location_elem is not None and checksum_elem is not None:
+                        href = location_elem.get('href')
+                        if href:
+                            checksums[href.rsplit('/', 1)[-1]] = (
+                                checksum_elem.text, int(size) if size else None)
             
             return checksums
             
@@ -1446,6 +1795,52 @@ class YumRepo:
             print(Colors.warning(f"  ⚠ Could not check for duplicates: {e}"))
             return {}
     
+    def _checksum_many(self, paths):
+        """Calculate SHA256 checksums of several files in parallel
+        
+        The MD5 of each file is computed in the same read and remembered, so
+        a later upload's ETag comparison doesn't read the file again.
+        
+        Args:
+            paths: List of file paths
+        
+        Returns:
+            Dict mapping each path to its SHA256 checksum
+        """
+        workers = min(self.checksum_workers, len(paths))
+        if workers <= 1:
+            digests = [self._calculate_digests(path) for path in paths]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                digests = list(executor.map(self._calculate_digests, paths))
+        
+        checksums = {}
+        for path, (sha256, md5) in zip(paths, digests):
+            checksums[path] = sha256
+            self._local_sha256[path] = sha256
+            self._local_md5[path] = md5
+        return checksums
+    
+    @staticmethod
+    def _calculate_digests(filepath):
+        """Calculate SHA256 and MD5 of a file in a single read
+        
+        Returns:
+            tuple: (sha256 hex digest, md5 hex digest)
+        """
+        sha256 = _new_sha256()
+        md5 = hashlib.md5(usedforsecurity=False)
+        buf = bytearray(_CHECKSUM_BUFFER_SIZE)
+        view = memoryview(buf)
+        with open(filepath, 'rb') as f:
+            while True:
+                n = f.readinto(buf)
+                if not n:
+                    break
+                sha256.update(view[:n])
+                md5.update(view[:n])
+        return sha256.hexdigest(), md5.hexdigest()
+    
     def _calculate_rpm_checksum(self, rpm_file):
         """Calculate SHA256 checksum of RPM file
         
@@ -1483,7 +1878,7 @@ class YumRepo:
         print("\nDownloading source metadata...")
         src_repo_dir = os.path.join(self.cache_dir, f"{src_distro}-{arch}-src")
         os.makedirs(src_repo_dir, exist_ok=True)
-        self.storage.sync_from_storage(f"{src_repo_path}/repodata", f"{src_repo_dir}/repodata")
+        self._sync_repodata(src_repo_path, src_repo_dir)
 
         # Parse source primary.xml to find packages
         print("Parsing source metadata...")
@@ -1535,12 +1930,11 @@ class YumRepo:
         repomd_tree = ET.parse(repomd_path)
         repomd_root = repomd_tree.getroot()
 
-        NS = {'repo': 'http://linux.duke.edu/metadata/repo'}
         primary_location = None
 
-        for data in repomd_root.findall('repo:data', NS):
+        for data in repomd_root.findall(_TAGS['repo'] + 'data'):
             if data.get('type') == 'primary':
-                location = data.find('repo:location', NS)
+                location = data.find(_TAGS['repo'] + 'location')
                 if location is not None:
                     primary_location = location.get('href').replace('repodata/', '')
                     break
@@ -1556,38 +1950,30 @@ class YumRepo:
         if not primary_location:
             raise ValueError("Could not find primary metadata in source repository")
 
-        # Parse primary.xml
+        # Stream primary.xml and filter packages
         primary_path = os.path.join(repodata_dir, primary_location)
-        with gzip.open(primary_path, 'rt', encoding='utf-8') as f:
-            primary_tree = ET.parse(f)
-            primary_root = primary_tree.getroot()
-
-        # Filter packages
-        NS_COMMON = {'common': 'http://linux.duke.edu/metadata/common'}
-        packages = primary_root.findall('common:package', NS_COMMON)
-        if not packages:
-            packages = primary_root.findall('package')
-
+        wanted = set(package_names)
         selected = []
-        for package in packages:
-            name_elem = package.find('common:name', NS_COMMON)
-            if name_elem is None:
-                name_elem = package.find('name')
-
-            if name_elem is not None and name_elem.text in package_names:
-                location_elem = package.find('common:location', NS_COMMON)
-                if location_elem is None:
-                    location_elem = package.find('location')
-
-                if location_elem is not None:
-                    # Store the entire package element as XML string
-                    pkg_xml = ET.tostring(package, encoding='unicode')
-                    selected.append({
-                        'name': name_elem.text,
-                        'filename': os.path.basename(location_elem.get('href')),
-                        'location': location_elem.get('href'),
-                        'xml': pkg_xml
-                    })
+        with gzip.open(primary_path, 'rb') as f:
+            for package in self._iter_primary_packages(f):
+                name_elem = package.find(_NAME_TAG)
+                if name_elem is None:
+                    name_elem = package.find('name')
+
+                if name_elem is not None and name_elem.text in wanted:
+                    location_elem = package.find(_LOCATION_TAG)
+                    if location_elem is None:
+                        location_elem = package.find('location')
+
+                    if location_elem is not None:
+                        # Store the entire package element as UTF-8 XML bytes
+                        pkg_xml = ET.tostring(package, encoding='utf-8')
+                        selected.append({
+                            'name': name_elem.text,
+                            'filename': location_elem.get('href').rsplit('/', 1)[-1],
+                            'location': location_elem.get('href'),
+                            'xml': pkg_xml
+                        })
 
         return selected
 
@@ -1604,56 +1990,30 @@ class YumRepo:
         repodata_dir = os.path.join(repo_dir, 'repodata')
         os.makedirs(repodata_dir, exist_ok=True)
 
-        # Build primary.xml with selected packages
-        NS_COMMON = 'http://linux.duke.edu/metadata/common'
-        NS_RPM = 'http://linux.duke.edu/metadata/rpm'
-
-        ET.register_namespace('', NS_COMMON)
-        ET.register_namespace('rpm', NS_RPM)
-
-        metadata = ET.Element('metadata', {
-            'xmlns': NS_COMMON,
-            'xmlns:rpm': NS_RPM,
-            'packages': str(len(packages))
-        })
-
-        # Add each package element
-        for pkg in packages:
-            pkg_elem = ET.fromstring(pkg['xml'])
-            metadata.append(pkg_elem)
-
-        # Write primary.xml
-        primary_path = os.path.join(repodata_dir, 'primary.xml')
-        tree = ET.ElementTree(metadata)
-        tree.write(primary_path, encoding='utf-8', xml_declaration=True)
-
-        # Compress primary.xml
-        primary_gz_path = primary_path + '.gz'
-        with open(primary_path, 'rb') as f_in:
-            with gzip.open(primary_gz_path, 'wb') as f_out:
-                f_out.write(f_in.read())
-        os.remove(primary_path)
+        # Write primary.xml.gz with the selected packages as serialized
+        file_stats = {}
+        nsmap = {None: _NS['common'], 'rpm': _NS['rpm']}
+        with tempfile.TemporaryFile() as body:
+            body.write(b'\n')
+            for pkg in packages:
+                body.write(_strip_inherited_ns(pkg['xml'], nsmap))
+            body.seek(0)
+            file_stats['primary'] = self._write_packages_gz(
+                os.path.join(repodata_dir, 'primary.xml.gz'), _TAGS['common'] + 'metadata',
+                {'packages': str(len(packages))}, nsmap, body)
 
         # Create minimal filelists.xml and other.xml
         for xml_type in ['filelists', 'other']:
             ns_uri = f'http://linux.duke.edu/metadata/{xml_type}'
-            ET.register_namespace('', ns_uri)
-            root = ET.Element(xml_type, {
-                'xmlns': ns_uri,
-                'packages': str(len(packages))
-            })
-            xml_path = os.path.join(repodata_dir, f'{xml_type}.xml')
-            tree = ET.ElementTree(root)
-            tree.write(xml_path, encoding='utf-8', xml_declaration=True)
-
-            # Compress
-            with open(xml_path, 'rb') as f_in:
-                with gzip.open(xml_path + '.gz', 'wb') as f_out:
-                    f_out.write(f_in.read())
-            os.remove(xml_path)
+            root = ET.Element(
+                f'{{{ns_uri}}}{xml_type}',
+                {'packages': str(len(packages))},
+                nsmap={None: ns_uri}
+            )
+            file_stats[xml_type] = self._write_xml_gz(root, os.path.join(repodata_dir, f'{xml_type}.xml.gz'))
 
         # Generate repomd.xml
-        self._generate_repomd(repodata_dir)
+        self._generate_repomd(repodata_dir, file_stats)
 
         # Create SQLite databases
         print("  Creating SQLite databases...")
@@ -1676,7 +2036,7 @@ class YumRepo:
         """
         # Download existing metadata
         print("  Downloading existing metadata...")
-        self.storage.sync_from_storage(f"{repo_path}/repodata", f"{repo_dir}/repodata")
+        self._sync_repodata(repo_path, repo_dir)
 
         # Backup before making changes
         self._backup_metadata(repo_dir, repo_path)
@@ -1689,12 +2049,11 @@ class YumRepo:
             repomd_tree = ET.parse(repomd_path)
             repomd_root = repomd_tree.getroot()
 
-            NS = {'repo': 'http://linux.duke.edu/metadata/repo'}
             primary_location = None
 
-            for data in repomd_root.findall('repo:data', NS):
+            for data in repomd_root.findall(_TAGS['repo'] + 'data'):
                 if data.get('type') == 'primary':
-                    location = data.find('repo:location', NS)
+                    location = data.find(_TAGS['repo'] + 'location')
                     if location is not None:
                         primary_location = location.get('href').replace('repodata/', '')
                         break
@@ -1707,54 +2066,38 @@ class YumRepo:
                             primary_location = location.get('href').replace('repodata/', '')
                             break
 
-            # Parse existing primary.xml
             primary_path = os.path.join(repodata_dir, primary_location)
-            with gzip.open(primary_path, 'rt', encoding='utf-8') as f:
-                primary_tree = ET.parse(f)
-                primary_root = primary_tree.getroot()
 
-            # Merge packages (replace if exists)
-            NS_COMMON = {'common': 'http://linux.duke.edu/metadata/common'}
-            existing_packages = {}
+            # Stream existing primary.xml, dropping old versions of the
+            # incoming packages and appending the new ones (replace if exists)
+            incoming = {pkg['name'] for pkg in packages}
+            replaced = set()
 
-            for pkg_elem in primary_root.findall('common:package', NS_COMMON):
-                name_elem = pkg_elem.find('common:name', NS_COMMON)
+            def keep_existing(package):
+                name_elem = package.find(_NAME_TAG)
                 if name_elem is None:
-                    name_elem = pkg_elem.find('name')
-                if name_elem is not None:
-                    existing_packages[name_elem.text] = pkg_elem
+                    name_elem = package.find('name')
+                if name_elem is not None and name_elem.text in incoming:
+                    replaced.add(name_elem.text)
+                    return False
+                return True
+
+            new_primary_gz = os.path.join(repodata_dir, 'primary.xml.gz')
+            _, _, primary_stats = self._filter_xml_stream(
+                primary_path, new_primary_gz, _PACKAGE_TAG, keep_existing,
+                [pkg['xml'] for pkg in packages])
+            if primary_path != new_primary_gz:
+                os.remove(primary_path)
 
-            # Add/replace packages
             for pkg in packages:
-                if pkg['name'] in existing_packages:
-                    # Remove old version
-                    primary_root.remove(existing_packages[pkg['name']])
+                if pkg['name'] in replaced:
                     print(f"  ↻ Updating {pkg['filename']}")
                 else:
                     print(f"  + Adding {pkg['filename']}")
 
-                # Add new version
-                pkg_elem = ET.fromstring(pkg['xml'])
-                primary_root.append(pkg_elem)
-
-            # Update package count
-            primary_root.set('packages', str(len(primary_root.findall('common:package', NS_COMMON))))
-
-            # Write updated primary.xml
-            new_primary_path = os.path.join(repodata_dir, 'primary.xml')
-            primary_tree.write(new_primary_path, encoding='utf-8', xml_declaration=True)
-
-            # Compress
-            new_primary_gz = new_primary_path + '.gz'
-            with open(new_primary_path, 'rb') as f_in:
-                with gzip.open(new_primary_gz, 'wb') as f_out:
-                    f_out.write(f_in.read())
-            os.remove(new_primary_path)
-            os.remove(primary_path)
-
             # Update other metadata files (filelists, other) - regenerate
             # For simplicity, we'll regenerate repomd
-            self._generate_repomd(repodata_dir)
+            self._generate_repomd(repodata_dir, {'primary': primary_stats})
 
             # Create SQLite databases
             print("  Updating SQLite databases...")
@@ -1775,16 +2118,21 @@ class YumRepo:
             self._restore_metadata(repo_path)
             raise
 
-    def _generate_repomd(self, repodata_dir):
-        """Generate repomd.xml from existing metadata files"""
-        NS = 'http://linux.duke.edu/metadata/repo'
-        ET.register_namespace('', NS)
-
-        repomd = ET.Element('repomd', {'xmlns': NS})
+    def _generate_repomd(self, repodata_dir, file_stats=None):
+        """Generate repomd.xml from existing metadata files
+        
+        Args:
+            repodata_dir: Directory holding the .xml.gz metadata files
+            file_stats: Optional {metadata_type: stats} recorded while writing
+                        files (see _write_xml_gz); files without stats are
+                        hashed from disk
+        """
+        file_stats = file_stats or {}
+        repomd = ET.Element(_TAGS['repo'] + 'repomd', nsmap={None: _NS['repo'], 'rpm': _NS['rpm']})
 
         # Add revision
         revision = ET.SubElement(repomd, 'revision')
-        revision.text = str(int(datetime.now().timestamp()))
+        revision.text = str(int(time.time()))
 
         # Add data elements for each metadata file
         for metadata_type in ['primary', 'filelists', 'other']:
@@ -1794,16 +2142,27 @@ class YumRepo:
             if os.path.exists(gz_path):
                 data = ET.SubElement(repomd, 'data', {'type': metadata_type})
 
-                checksum = self.calculate_checksum(gz_path)
+                stats = file_stats.get(metadata_type)
+                if stats is None:
+                    sha256 = _new_sha256()
+                    uncompressed_size = 0
+                    with gzip.open(gz_path, 'rb') as f:
+                        for chunk in iter(lambda: f.read(_CHECKSUM_BUFFER_SIZE), b''):
+                            sha256.update(chunk)
+                            uncompressed_size += len(chunk)
+                    stats = {
+                        'checksum': self.calculate_checksum(gz_path),
+                        'size': str(os.path.getsize(gz_path)),
+                        'open-checksum': sha256.hexdigest(),
+                        'open-size': str(uncompressed_size),
+                    }
+
                 checksum_elem = ET.SubElement(data, 'checksum', {'type': 'sha256'})
-                checksum_elem.text = checksum
+                checksum_elem.text = stats['checksum']
 
                 # Open checksum (uncompressed)
-                with gzip.open(gz_path, 'rb') as f:
-                    uncompressed = f.read()
-                    open_checksum = hashlib.sha256(uncompressed).hexdigest()
                 open_checksum_elem = ET.SubElement(data, 'open-checksum', {'type': 'sha256'})
-                open_checksum_elem.text = open_checksum
+                open_checksum_elem.text = stats['open-checksum']
 
                 location = ET.SubElement(data, 'location', {'href': f'repodata/{gz_file}'})
 
@@ -1811,15 +2170,14 @@ class YumRepo:
                 timestamp.text = str(int(os.path.getmtime(gz_path)))
 
                 size = ET.SubElement(data, 'size')
-                size.text = str(os.path.getsize(gz_path))
+                size.text = stats['size']
 
                 open_size = ET.SubElement(data, 'open-size')
-                open_size.text = str(len(uncompressed))
+                open_size.text = stats['open-size']
 
         # Write repomd.xml
         repomd_path = os.path.join(repodata_dir, 'repomd.xml')
-        tree = ET.ElementTree(repomd)
-        tree.write(repomd_path, encoding='utf-8', xml_declaration=True)
+        self._write_repomd(repomd, repomd_path)
 
     def _create_sqlite_databases(self, repodata_dir):
         """Create SQLite databases from XML metadata"""
@@ -1834,28 +2192,306 @@ class YumRepo:
 
         if metadata_files:
             db_files = sqlite_mgr.create_all_databases(metadata_files)
-            compressed_dbs = {}
-            for db_type, db_path in db_files.items():
-                compressed_dbs[db_type] = sqlite_mgr.compress_sqlite(db_path)
+            compressed_dbs = self._compress_databases(sqlite_mgr, db_files)
 
             # Update repomd.xml with database entries
             repomd_path = os.path.join(repodata_dir, 'repomd.xml')
             repomd_tree = ET.parse(repomd_path)
             repomd_root = repomd_tree.getroot()
 
-            for db_type, db_path in compressed_dbs.items():
-                self._add_database_to_repomd(repomd_root, repodata_dir, db_type, db_path)
+            for db_type, (db_path, open_stats) in compressed_dbs.items():
+                self._add_database_to_repomd(repomd_root, repodata_dir, db_type, db_path, open_stats=open_stats)
 
             # Write updated repomd.xml
-            with open(repomd_path, 'wb') as f:
-                repomd_tree.write(f, encoding='utf-8', xml_declaration=True, pretty_print=False)
+            self._write_repomd(repomd_root, repomd_path)
 
+    @staticmethod
+    def _iter_primary_packages(fileobj):
+        """Yield the <package> elements of an uncompressed primary.xml stream
+        
+        Each element is cleared, along with already-handled siblings, once the
+        caller moves on, so only one package is held in memory at a time.
+        Files whose namespace was stripped are handled too.
+        """
+        for _, package in ET.iterparse(fileobj, events=('end',), tag=(_PACKAGE_TAG, 'package')):
+            yield package
+            package.clear(keep_tail=True)
+            while package.getprevious() is not None:
+                del package.getparent()[0]
+    
+    @staticmethod
+    def _filter_xml_stream(in_path, out_path, package_tag, keep_predicate, extra_packages=()):
+        """Stream <package> elements from one gzipped metadata file to another
+        
+        Packages are parsed one at a time and cleared once handled, so memory
+        use does not grow with the size of the repository. The root element's
+        'packages' attribute is rewritten with the number of packages written.
+        in_path is fully read before out_path is opened, so they may be the
+        same file.
+        
+        Args:
+            in_path: Path to source .xml.gz file
+            out_path: Path to write filtered .xml.gz file
+            package_tag: Clark-notation tag of the package elements
+            keep_predicate: Callable taking a package element, True to keep it
+            extra_packages: Serialized (UTF-8 bytes) package elements to
+                            append after the kept ones
+        
+        Returns:
+            tuple: (kept, removed, stats) where stats maps the repomd fields
+                   'checksum', 'size', 'open-checksum' and 'open-size' to the
+                   values for the written file, computed while writing it
+        """
+        kept = removed = 0
+        with tempfile.TemporaryFile() as body:
+            with gzip.open(in_path, 'rb') as f:
+                context = ET.iterparse(f, events=('end',), tag=package_tag)
+                nsmap = None
+                for _, package in context:
+                    if nsmap is None:
+                        # Whitespace between the root start tag and the first package
+                        nsmap = package.getparent().nsmap
+                        body.write((package.getparent().text or '').encode('utf-8'))
+                    if keep_predicate(package):
+                        body.write(_strip_inherited_ns(ET.tostring(package, encoding='utf-8'), nsmap))
+                        kept += 1
+                    else:
+                        removed += 1
+                    package.clear(keep_tail=True)
+                    while package.getprevious() is not None:
+                        del package.getparent()[0]
+                root = context.root
+            for package_xml in extra_packages:
+                body.write(_strip_inherited_ns(package_xml, root.nsmap))
+                kept += 1
+            
+            attrib = dict(root.attrib)
+            attrib['packages'] = str(kept)
+            body.seek(0)
+            stats = YumRepo._write_packages_gz(out_path, root.tag, attrib, root.nsmap, body)
+        
+        return kept, removed, stats
+    
+    @staticmethod
+    def _write_packages_gz(out_path, root_tag, attrib, nsmap, body):
+        """Write a gzipped metadata document around already serialized packages
+        
+        Compressed and uncompressed bytes are hashed on their way to disk
+        instead of re-reading the file afterwards.
+        
+        Args:
+            out_path: Path of the .xml.gz file to write
+            root_tag: Clark-notation tag of the root element
+            attrib: Root element attributes (including 'packages')
+            nsmap: Root element namespace map
+            body: File object positioned at the serialized package elements
+        
+        Returns:
+            dict: repomd stats for the written file (see _write_xml_gz)
+        """
+        with open(out_path, 'wb') as raw:
+            compressed = _HashingWriter(raw)
+            with gzip.GzipFile(fileobj=compressed, mode='wb', mtime=0,
+                               compresslevel=GZIP_COMPRESSLEVEL) as gz:
+                uncompressed = _HashingWriter(gz)
+                with ET.xmlfile(uncompressed, encoding='utf-8') as xf:
+                    xf.write_declaration()
+                    with xf.element(root_tag, attrib, nsmap=nsmap):
+                        xf.flush()
+                        shutil.copyfileobj(body, uncompressed)
+        
+        return {
+            'checksum': compressed.sha256.hexdigest(),
+            'size': str(compressed.size),
+            'open-checksum': uncompressed.sha256.hexdigest(),
+            'open-size': str(uncompressed.size),
+        }
+    
+    @staticmethod
+    def _splice_packages(existing_path, new_path):
+        """Append the packages of one gzipped metadata file to another as bytes
+        
+        The new file's package elements are inserted before the existing
+        root's closing tag and its 'packages' count is bumped; the existing
+        packages are streamed through without being parsed. This only works
+        when both documents declare the same namespace prefixes, which holds
+        for files written by createrepo_c and yums3.
+        
+        Args:
+            existing_path: Metadata .xml.gz file to extend (rewritten in place)
+            new_path: Metadata .xml.gz file with the packages to add
+        
+        Returns:
+            dict: repomd 'checksum', 'size', 'open-checksum' and 'open-size'
+                  values for the rewritten file, or None if the files could
+                  not be spliced (existing_path is then left untouched)
+        """
+        with gzip.open(new_path, 'rb') as f:
+            new_data = f.read()
+        new_root = _ROOT_START_RE.search(new_data)
+        new_count = _PACKAGES_ATTR_RE.search(new_root.group(2)) if new_root else None
+        if new_count is None:
+            return None
+        if new_root.group(2).endswith(b'/'):
+            new_body = b''
+        else:
+            closing = b'</' + new_root.group(1) + b'>'
+            new_body = new_data[new_root.end():new_data.rfind(closing)]
+        
+        tmp_path = existing_path + '.tmp'
+        try:
+            with gzip.open(existing_path, 'rb') as src:
+                head = b''
+                root = None
+                while root is None:
+                    chunk = src.read(_CHECKSUM_BUFFER_SIZE)
+                    if not chunk:
+                        return None
+                    head += chunk
+                    root = _ROOT_START_RE.search(head)
+                
+                attrs = root.group(2)
+                count = _PACKAGES_ATTR_RE.search(attrs)
+                if (root.group(1) != new_root.group(1) or attrs.endswith(b'/') or count is None
+                        or not set(_XMLNS_RE.findall(new_root.group(2))) <= set(_XMLNS_RE.findall(attrs))):
+                    return None
+                total = int(count.group(2)) + int(new_count.group(2))
+                start_tag = b'<%s%s%s%d%s%s>' % (root.group(1), attrs[:count.start()], count.group(1),
+                                                 total, count.group(3), attrs[count.end():])
+                closing = b'</' + root.group(1) + b'>'
+                
+                with open(tmp_path, 'wb') as raw:
+                    compressed = _HashingWriter(raw)
+                    with gzip.GzipFile(fileobj=compressed, mode='wb', mtime=0,
+                                       compresslevel=GZIP_COMPRESSLEVEL) as gz:
+                        out = _HashingWriter(gz)
+                        out.write(head[:root.start()] + start_tag)
+                        # Never write past the last closing tag seen so far (or a
+                        # partial one at the end of the buffer), so the final
+                        # one is still held back however much trails it
+                        pending = head[root.end():]
+                        for chunk in iter(lambda: src.read(_CHECKSUM_BUFFER_SIZE), b''):
+                            pending += chunk
+                            if len(pending) > _CHECKSUM_BUFFER_SIZE:
+                                cut = pending.rfind(closing)
+                                if cut < 0:
+                                    cut = len(pending) - len(closing) + 1
+                                out.write(pending[:cut])
+                                pending = pending[cut:]
+                        end = pending.rfind(closing)
+                        if end < 0:
+                            return None
+                        out.write(pending[:end])
+                        out.write(new_body)
+                        out.write(pending[end:])
+            
+            os.replace(tmp_path, existing_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        
+        return {
+            'checksum': compressed.sha256.hexdigest(),
+            'size': str(compressed.size),
+            'open-checksum': out.sha256.hexdigest(),
+            'open-size': str(out.size),
+        }
+    
+    def _merge_package_file(self, existing_path, new_path, package_tag):
+        """Append the packages of new_path to existing_path
+        
+        Returns:
+            dict: repomd stats for the rewritten file, from _splice_packages
+                  or, when the files had to be merged by parsing them, from
+                  _write_xml_gz
+        """
+        stats = self._splice_packages(existing_path, new_path)
+        if stats is None:
+            # Unexpected layout (e.g. different namespace prefixes)
+            stats = self._merge_package_trees(existing_path, new_path, package_tag)
+        return stats
+    
+    def _merge_package_trees(self, existing_path, new_path, package_tag):
+        """Append the packages of new_path to existing_path by parsing both files
+        
+        Returns:
+            dict: repomd stats for the rewritten file (see _write_xml_gz)
+        """
+        with gzip.open(existing_path, 'rb') as f:
+            existing_tree = ET.parse(f)
+            existing_root = existing_tree.getroot()
+        
+        with gzip.open(new_path, 'rb') as f:
+            new_root = ET.parse(f).getroot()
+        
+        new_packages = new_root.findall(package_tag)
+        existing_root.extend(new_packages)
+        
+        current_count = int(existing_root.get('packages', '0'))
+        existing_root.set('packages', str(current_count + len(new_packages)))
+        
+        # lxml keeps the original namespace prefixes when writing
+        return self._write_xml_gz(existing_tree, existing_path)
+    
+    @staticmethod
+    def _write_repomd(repomd_root, repomd_path):
+        """Serialize repomd.xml straight to disk and atomically replace the old file"""
+        tmp_path = repomd_path + '.tmp'
+        ET.ElementTree(repomd_root).write(tmp_path, encoding='utf-8', xml_declaration=True)
+        os.replace(tmp_path, repomd_path)
+    
+    @staticmethod
+    def _write_xml_gz(tree, filepath):
+        """Serialize an XML tree (or root element) straight into a gzip stream
+        
+        lxml writes into the compressor as it serializes, so neither the XML
+        text nor the compressed output is ever held in memory whole.
+        
+        Returns:
+            dict: repomd 'checksum', 'size', 'open-checksum' and 'open-size'
+                  values for the written file, computed while writing it
+        """
+        if not hasattr(tree, 'write'):
+            tree = ET.ElementTree(tree)
+        with open(filepath, 'wb') as raw:
+            compressed = _HashingWriter(raw)
+            with gzip.GzipFile(fileobj=compressed, mode='wb', mtime=0,
+                               compresslevel=GZIP_COMPRESSLEVEL) as gz:
+                uncompressed = _HashingWriter(gz)
+                tree.write(uncompressed, encoding='utf-8', xml_declaration=True)
+        
+        return {
+            'checksum': compressed.sha256.hexdigest(),
+            'size': str(compressed.size),
+            'open-checksum': uncompressed.sha256.hexdigest(),
+            'open-size': str(uncompressed.size),
+        }
+    
     @staticmethod
     def calculate_checksum(filepath):
         """Calculate SHA256 checksum of a file"""
-        sha256 = hashlib.sha256()
         with open(filepath, 'rb') as f:
-            for chunk in iter(lambda: f.read(4096), b''):
-                sha256.update(chunk)
+            if os.fstat(f.fileno()).st_size:
+                try:
+                    # Hash straight from the page cache, no read() copies
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                        if hasattr(mmap, 'MADV_SEQUENTIAL'):
+                            # Single front-to-back pass; let readahead run ahead
+                            mm.madvise(mmap.MADV_SEQUENTIAL)
+                        return _new_sha256(mm).hexdigest()
+                except (OSError, ValueError):
+                    # Not mappable (e.g. some network filesystems); read instead
+                    pass
+            if hasattr(hashlib, 'file_digest'):
+                # Python 3.11+: hashes in C with the GIL released
+                return hashlib.file_digest(f, _new_sha256).hexdigest()
+            sha256 = _new_sha256()
+            buf = bytearray(_CHECKSUM_BUFFER_SIZE)
+            view = memoryview(buf)
+            while True:
+                n = f.readinto(buf)
+                if not n:
+                    break
+                sha256.update(view[:n])
         return sha256.hexdigest()
 
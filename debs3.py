@@ -12,14 +12,29 @@ Licensed under the MIT License. See LICENSE file for details.
 import argparse
 import os
 import sys
-import re
 
 from core.config import load_config, config_command
-from core.deb import DebRepo
 from core import Colors
 
 
-def main():
+def __getattr__(name):
+    # DebRepo pulls in boto3; import it on first use (``from debs3 import
+    # DebRepo`` still works) so the config command starts quickly
+    if name == 'DebRepo':
+        from core.deb import DebRepo
+        return DebRepo
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+_PARSER = None
+
+
+def _build_parser():
+    """Build the command-line parser, once per process"""
+    global _PARSER
+    if _PARSER is not None:
+        return _PARSER
+
     parser = argparse.ArgumentParser(
         description='Efficient Debian repository manager for S3',
     )
@@ -76,7 +91,12 @@ def main():
     config_parser.add_argument('--local', action='store_true', help='Use local config (./debs3.conf)')
     config_parser.add_argument('--system', action='store_true', help='Use system config (/etc/debs3.conf)')
     
-    args = parser.parse_args()
+    _PARSER = parser
+    return parser
+
+
+def main():
+    args = _build_parser().parse_args()
     
     # Handle config command
     if args.command == 'config':
@@ -87,6 +107,8 @@ def main():
         config = load_config(args, 'deb')
         
         # Initialize repository manager
+        # Imported here so the config command doesn't pay for boto3
+        from core.deb import DebRepo
         repo = DebRepo(config)
 
         action = args.command.upper()
@@ -109,8 +131,7 @@ def main():
             print(f"  Source:       {args.src}")
             print(f"  Destination:  {args.dst}")
             print(f"  Packages:     {len(args.package_names)}")
-            for pkg in args.package_names:
-                print(f"    • {pkg}")
+            sys.stdout.writelines(f"    • {pkg}\n" for pkg in args.package_names)
             print()
 
             # Confirm operation
@@ -139,8 +160,7 @@ def main():
 
         print(f"  Action:       {Colors.bold(action)}")
         print(f"  Packages:     {len(args.deb_files)}")
-        for f in args.deb_files:
-            print(f"    • {os.path.basename(f)}")
+        sys.stdout.writelines(f"    • {os.path.basename(f)}\n" for f in args.deb_files)
         print()
 
         # Confirm operation
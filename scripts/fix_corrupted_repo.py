@@ -7,7 +7,6 @@ Removes duplicate SQLite database entries and cleans up old database files
 import os
 import sys
 import xml.etree.ElementTree as ET
-import re
 from pathlib import Path
 
 def fix_repomd_xml(repomd_path):
@@ -161,6 +161,18 @@ def test_save_and_load():
         assert 'backend.s3.bucket' in data
         print("✓ File format is correct (dot notation)")
         
+        # Edits made outside RepoConfig are seen by the next load
+        data['backend.s3.bucket'] = 'edited-bucket'
+        with open(config_file, 'w') as f:
+            json.dump(data, f)
+        config3 = RepoConfig(config_file)
+        assert config3.get('backend.s3.bucket') == 'edited-bucket'
+        
+        # Changing one instance does not leak into a fresh load
+        config3.set('backend.s3.bucket', 'unsaved-bucket')
+        assert RepoConfig(config_file).get('backend.s3.bucket') == 'edited-bucket'
+        print("✓ Each load reads the current file")
+        
         return True
     
     finally:
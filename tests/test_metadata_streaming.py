@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Test streamed metadata rewriting
+
+Tests the package filters used when removing packages, and the byte-level
+splice used when merging metadata with its fallback to a parsed merge.
+"""
+
+import os
+import sys
+import gzip
+import json
+import tempfile
+
+from lxml import etree as ET
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+from core.config import RepoConfig
+from core.yum import YumRepo, _keep_unless_pkgid
+
+
+COMMON_NS = 'http://linux.duke.edu/metadata/common'
+RPM_NS = 'http://linux.duke.edu/metadata/rpm'
+PACKAGE_TAG = '{%s}package' % COMMON_NS
+
+
+def write_metadata(path, names, root='<metadata xmlns="%s" xmlns:rpm="%s" packages="0">' % (COMMON_NS, RPM_NS),
+                   trailer=''):
+    """Helper to write a gzipped primary-like file with one package per name"""
+    root = root.replace('packages="0"', 'packages="%d"' % len(names))
+    close = '</' + root[1:].split()[0] + '>'
+    packages = ''.join('<package type="rpm"><name>%s</name></package>\n' % name for name in names)
+    with gzip.open(path, 'wb') as f:
+        f.write(('<?xml version="1.0" encoding="UTF-8"?>\n%s\n%s%s%s' % (root, packages, close, trailer)).encode('utf-8'))
+
+
+def read_names(path):
+    """Helper to return the root element and package names of a gzipped file"""
+    with gzip.open(path, 'rb') as f:
+        root = ET.fromstring(f.read())
+    return root, [pkg.findtext('{%s}name' % COMMON_NS) for pkg in root]
+
+
+def create_test_repo(tmpdir):
+    """Helper to create a YumRepo on a local backend"""
+    config_file = os.path.join(tmpdir, 'test.conf')
+    with open(config_file, 'w') as f:
+        json.dump({
+            'backend.type': 'local',
+            'backend.local.path': os.path.join(tmpdir, 'storage'),
+            'repo.rpm.cache_dir': os.path.join(tmpdir, 'cache'),
+            'validation.enabled': False
+        }, f)
+    return YumRepo(RepoConfig(config_file, 'rpm'))
+
+
+def test_filter_xml_stream():
+    """Test filtering and appending packages while streaming"""
+    print("=" * 60)
+    print("Test: Filter XML Stream")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        src = os.path.join(tmpdir, 'primary.xml.gz')
+        out = os.path.join(tmpdir, 'primary.xml.gz.new')
+        write_metadata(src, ['keep1', 'drop', 'keep2'])
+
+        def keep(package):
+            return package.findtext('{%s}name' % COMMON_NS) != 'drop'
+
+        extra = b'<package xmlns="%s" type="rpm"><name>added</name></package>' % COMMON_NS.encode()
+        kept, removed, stats = YumRepo._filter_xml_stream(src, out, PACKAGE_TAG, keep, [extra])
+        # kept counts every package written, appended ones included
+        assert (kept, removed) == (3, 1)
+        root, names = read_names(out)
+        assert names == ['keep1', 'keep2', 'added']
+        assert root.get('packages') == '3'
+        assert root.nsmap == {None: COMMON_NS, 'rpm': RPM_NS}
+        print("✓ Packages filtered, appended and counted")
+
+        with gzip.open(out, 'rb') as f:
+            data = f.read()
+        assert stats['size'] == str(os.path.getsize(out))
+        assert stats['open-size'] == str(len(data))
+        print("✓ Stats match the written file")
+        assert data.count(b'xmlns=') == 1 and data.count(b'xmlns:rpm=') == 1
+        print("✓ Namespaces declared once on the root")
+
+        # Rewriting a file in place
+        YumRepo._filter_xml_stream(src, src, PACKAGE_TAG, keep)
+        assert read_names(src)[1] == ['keep1', 'keep2']
+        print("✓ Output may replace the input")
+
+        return True
+
+
+def test_keep_unless_pkgid():
+    """Test the filelists/other package filter"""
+    print("=" * 60)
+    print("Test: Keep Unless Pkgid")
+    print("=" * 60)
+
+    removed = {'abc'}
+    assert not _keep_unless_pkgid(removed, ET.Element('package', pkgid='abc'))
+    assert _keep_unless_pkgid(removed, ET.Element('package', pkgid='def'))
+    assert _keep_unless_pkgid(removed, ET.Element('package'))
+    print("✓ Only packages with a removed pkgid are dropped")
+
+    return True
+
+
+def test_splice_packages():
+    """Test splicing packages into existing metadata"""
+    print("=" * 60)
+    print("Test: Splice Packages")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        existing = os.path.join(tmpdir, 'existing.xml.gz')
+        new = os.path.join(tmpdir, 'new.xml.gz')
+        trailer = '\n<!-- trailing comment -->\n'
+        write_metadata(existing, ['pkg%d' % i for i in range(2000)], trailer=trailer)
+        write_metadata(new, ['added'])
+
+        stats = YumRepo._splice_packages(existing, new)
+        assert stats is not None
+        root, names = read_names(existing)
+        assert root.get('packages') == '2001'
+        assert names[-1] == 'added' and len(names) == 2001
+        print("✓ Package appended and count bumped")
+
+        with open(existing, 'rb') as f:
+            data = f.read()
+        assert stats['size'] == str(len(data))
+        assert stats['open-size'] == str(len(gzip.decompress(data)))
+        assert gzip.decompress(data).endswith(trailer.encode('utf-8'))
+        print("✓ Trailer kept and stats match the rewritten file")
+
+        return True
+
+
+def test_splice_falls_back():
+    """Test that differing roots are left to the parsed merge"""
+    print("=" * 60)
+    print("Test: Splice Fallback")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        existing = os.path.join(tmpdir, 'existing.xml.gz')
+        new = os.path.join(tmpdir, 'new.xml.gz')
+        prefixed_root = '<c:metadata xmlns="%s" xmlns:c="%s" packages="0">' % (COMMON_NS, COMMON_NS)
+
+        # Same namespaces declared in a different order still splice
+        write_metadata(existing, ['old'])
+        write_metadata(new, ['added'], root='<metadata packages="0" xmlns:rpm="%s" xmlns="%s">' % (RPM_NS, COMMON_NS))
+        assert YumRepo._splice_packages(existing, new) is not None
+        assert read_names(existing)[1] == ['old', 'added']
+        print("✓ Reordered namespace declarations are spliced")
+
+        # Different root prefix
+        write_metadata(existing, ['old'])
+        write_metadata(new, ['added'], root=prefixed_root)
+        with open(existing, 'rb') as f:
+            before = f.read()
+        assert YumRepo._splice_packages(existing, new) is None
+        with open(existing, 'rb') as f:
+            assert f.read() == before
+        assert not os.path.exists(existing + '.tmp')
+        print("✓ Different root prefix is not spliced")
+
+        # Namespace missing from the existing root
+        write_metadata(existing, ['old'], root='<metadata xmlns="%s" packages="0">' % COMMON_NS)
+        write_metadata(new, ['added'])
+        assert YumRepo._splice_packages(existing, new) is None
+        print("✓ Undeclared namespace is not spliced")
+
+        # The parsed merge handles what the splice refuses
+        write_metadata(existing, ['old'])
+        write_metadata(new, ['added'], root=prefixed_root)
+        create_test_repo(tmpdir)._merge_package_trees(existing, new, PACKAGE_TAG)
+        root, names = read_names(existing)
+        assert names == ['old', 'added'] and root.get('packages') == '2'
+        print("✓ Parsed merge used as fallback")
+
+        return True
+
+
+def test_splice_long_trailer():
+    """Test splicing when more than a read buffer follows the closing tag"""
+    print("=" * 60)
+    print("Test: Splice Long Trailer")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        existing = os.path.join(tmpdir, 'existing.xml.gz')
+        new = os.path.join(tmpdir, 'new.xml.gz')
+        trailer = '\n' + ' ' * (1 << 20) + '<!-- %s -->\n' % ('x' * (1 << 20))
+        write_metadata(existing, ['old'], trailer=trailer)
+        write_metadata(new, ['added'])
+
+        stats = YumRepo._splice_packages(existing, new)
+        assert stats is not None
+        assert read_names(existing)[1] == ['old', 'added']
+        with gzip.open(existing, 'rb') as f:
+            assert f.read().endswith(trailer.encode('utf-8'))
+        print("✓ Closing tag found past the trailer")
+
+        return True
+
+
+if __name__ == '__main__':
+    tests = [
+        test_filter_xml_stream,
+        test_keep_unless_pkgid,
+        test_splice_packages,
+        test_splice_falls_back,
+        test_splice_long_trailer,
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test in tests:
+        try:
+            if test():
+                passed += 1
+            else:
+                failed += 1
+                print(f"✗ {test.__name__} failed")
+        except Exception as e:
+            failed += 1
+            print(f"✗ {test.__name__} raised exception: {e}")
+            import traceback
+            traceback.print_exc()
+
+    print()
+    print("=" * 60)
+    print(f"Results: {passed} passed, {failed} failed")
+    print("=" * 60)
+
+    sys.exit(0 if failed == 0 else 1)
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Test RPM arch/EL detection
+
+Tests that conventional filenames are trusted and that the remaining RPM
+headers are read with one batched rpm call and cached.
+"""
+
+import os
+import sys
+import json
+import subprocess
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+import core.yum
+from core.config import RepoConfig
+from core.yum import YumRepo
+
+
+def create_test_repo(tmpdir):
+    """Helper to create a YumRepo on a local backend"""
+    config_file = os.path.join(tmpdir, 'test.conf')
+    with open(config_file, 'w') as f:
+        json.dump({
+            'backend.type': 'local',
+            'backend.local.path': os.path.join(tmpdir, 'storage'),
+            'repo.rpm.cache_dir': os.path.join(tmpdir, 'cache'),
+            'validation.enabled': False
+        }, f)
+    return YumRepo(RepoConfig(config_file, 'rpm'))
+
+
+def mock_rpm_query(calls):
+    """Helper returning a subprocess.run stand-in for rpm -qp that records calls
+
+    Files named 'broken*' make the whole query fail, like a corrupt RPM.
+    """
+    def mock_run(cmd, **kwargs):
+        calls.append(cmd[4:])
+        files = cmd[4:]
+        if any('broken' in f for f in files):
+            lines = ['x86_64\t1.el9' for f in files if 'broken' not in f]
+            return subprocess.CompletedProcess(cmd, 1, ''.join(line + '\n' for line in lines), 'error')
+        return subprocess.CompletedProcess(cmd, 0, ''.join('aarch64\t2.el8\n' for _ in files), '')
+    return mock_run
+
+
+def test_detect_from_rpms():
+    """Test batched arch/EL detection"""
+    print("=" * 60)
+    print("Test: Detect From RPMs")
+    print("=" * 60)
+
+    calls = []
+    original_run = core.yum.subprocess.run
+    core.yum.subprocess.run = mock_rpm_query(calls)
+    try:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            repo = create_test_repo(tmpdir)
+
+            result = repo._detect_from_rpms(['/x/a.rpm', '/x/b.rpm', '/x/a.rpm'])
+            assert result == {'/x/a.rpm': ('aarch64', 'el8'), '/x/b.rpm': ('aarch64', 'el8')}
+            assert calls == [['/x/a.rpm', '/x/b.rpm']]
+            print("✓ Headers read in a single rpm call")
+
+            repo._detect_from_rpms(['/x/b.rpm', '/x/a.rpm'])
+            assert len(calls) == 1
+            print("✓ Results cached per path")
+
+            # A failing batch is retried per file so the error names the RPM
+            try:
+                repo._detect_from_rpms(['/x/c.rpm', '/x/broken.rpm'])
+                assert False, "Expected ValueError"
+            except ValueError as e:
+                assert 'broken.rpm' in str(e)
+            assert calls[1:] == [['/x/c.rpm', '/x/broken.rpm'], ['/x/c.rpm'], ['/x/broken.rpm']]
+            print("✓ Failed batch reports the offending RPM")
+    finally:
+        core.yum.subprocess.run = original_run
+
+    return True
+
+
+def test_detect_from_filenames():
+    """Test that conventional filenames skip the rpm call"""
+    print("=" * 60)
+    print("Test: Detect From Filenames")
+    print("=" * 60)
+
+    calls = []
+    original_run = core.yum.subprocess.run
+    core.yum.subprocess.run = mock_rpm_query(calls)
+    try:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            repo = create_test_repo(tmpdir)
+
+            result = repo._detect_from_rpms(['/x/foo-1.0-1.el9.x86_64.rpm', '/x/bar-2.0-1.el8.noarch.rpm'])
+            assert result == {'/x/foo-1.0-1.el9.x86_64.rpm': ('x86_64', 'el9'),
+                              '/x/bar-2.0-1.el8.noarch.rpm': ('noarch', 'el8')}
+            assert calls == []
+            print("✓ Detected from filenames")
+
+            result = repo._detect_from_rpms(['/x/a.rpm', '/x/foo-1.0-1.el9.x86_64.rpm'])
+            assert result['/x/a.rpm'] == ('aarch64', 'el8')
+            assert calls == [['/x/a.rpm']]
+            print("✓ Only unconventional names are queried")
+    finally:
+        core.yum.subprocess.run = original_run
+
+    return True
+
+
+if __name__ == '__main__':
+    tests = [
+        test_detect_from_rpms,
+        test_detect_from_filenames,
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test in tests:
+        try:
+            if test():
+                passed += 1
+            else:
+                failed += 1
+                print(f"✗ {test.__name__} failed")
+        except Exception as e:
+            failed += 1
+            print(f"✗ {test.__name__} raised exception: {e}")
+            import traceback
+            traceback.print_exc()
+
+    print()
+    print("=" * 60)
+    print(f"Results: {passed} passed, {failed} failed")
+    print("=" * 60)
+
+    sys.exit(0 if failed == 0 else 1)
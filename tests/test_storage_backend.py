@@ -11,23 +11,34 @@ import sys
 import tempfile
 import shutil
 import json
+import base64
+import hashlib
 from pathlib import Path
+from types import SimpleNamespace
+
+from botocore.exceptions import ClientError
 
 # Add parent directory to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from core.backend import LocalStorageBackend
+from core.backend import LocalStorageBackend, S3StorageBackend
 from core.config import RepoConfig
 from yums3 import YumRepo
 
 
-def create_test_config(storage_path, cache_path):
-    """Helper to create a test config"""
+def create_test_config(storage_path, cache_path, backend_type='local'):
+    """Helper to create a test config
+
+    For the 's3' backend, tests replace the s3_client calls they use with
+    mock functions, so no bucket is needed.
+    """
     config_file = os.path.join(tempfile.gettempdir(), f'test_config_{os.getpid()}.conf')
     with open(config_file, 'w') as f:
         json.dump({
-            'backend.type': 'local',
+            'backend.type': backend_type,
             'backend.local.path': storage_path,
+            'backend.s3.bucket': 'test-bucket',
+            'backend.s3.region': 'us-east-1',
             'repo.cache_dir': cache_path,
             'validation.enabled': False
         }, f)
@@ -165,6 +176,289 @@ def test_local_storage_merge():
             return False
 
 
+def test_matches_stored_file():
+    """Test skipping uploads of RPMs already in storage"""
+    print("=" * 60)
+    print("Test: Matches Stored File")
+    print("=" * 60)
+    
+    with tempfile.TemporaryDirectory() as tmpdir:
+        storage_path = os.path.join(tmpdir, 'storage')
+        os.makedirs(os.path.join(storage_path, 'el9', 'x86_64'))
+        with open(os.path.join(storage_path, 'el9', 'x86_64', 'a.rpm'), 'wb') as f:
+            f.write(b'rpm')
+        repo = YumRepo(create_test_config(storage_path, os.path.join(tmpdir, 'cache')))
+        
+        # Local files have no ETag; listing them must not read them
+        info = repo.storage.list_file_info('el9/x86_64/', suffix='.rpm')
+        assert info == {'a.rpm': (3, None)}
+        print("✓ Sizes listed without hashing")
+        
+        local = os.path.join(tmpdir, 'a.rpm')
+        with open(local, 'wb') as f:
+            f.write(b'rpm')
+        assert repo._matches_stored_file(local, 'el9/x86_64/a.rpm', info['a.rpm'])
+        assert not repo._matches_stored_file(local, 'el9/x86_64/a.rpm', None)
+        assert not repo._matches_stored_file(local, 'el9/x86_64/a.rpm', (4, None))
+        with open(local, 'wb') as f:
+            f.write(b'RPM')
+        assert not repo._matches_stored_file(local, 'el9/x86_64/a.rpm', info['a.rpm'])
+        print("✓ Stored copy compared only for the file being added")
+        
+        # Multipart ETags fall back to the SHA256 S3 stored
+        repo = YumRepo(create_test_config(storage_path, os.path.join(tmpdir, 'cache'), 's3'))
+        heads = {
+            'el9/x86_64/a.rpm': {'ChecksumSHA256': base64.b64encode(hashlib.sha256(b'RPM').digest()).decode()},
+            'el9/x86_64/b.rpm': {},
+        }
+        
+        def mock_head_object(Bucket, Key, ChecksumMode):
+            return heads[Key]
+        
+        repo.storage.s3_client.head_object = mock_head_object
+        multipart = (3, hashlib.md5(b'RPM').hexdigest() + '-2')
+        assert repo._matches_stored_file(local, 'el9/x86_64/a.rpm', multipart)
+        assert not repo._matches_stored_file(local, 'el9/x86_64/b.rpm', multipart)
+        with open(local, 'wb') as f:
+            f.write(b'rpm')
+        assert not repo._matches_stored_file(local, 'el9/x86_64/a.rpm', multipart)
+        print("✓ Multipart uploads compared by stored SHA256")
+        
+        return True
+
+
+def test_s3_delete_files():
+    """Test that S3 deletes are batched into DeleteObjects requests"""
+    print("=" * 60)
+    print("Test: S3 Batched Deletes")
+    print("=" * 60)
+    
+    with tempfile.TemporaryDirectory() as tmpdir:
+        backend = S3StorageBackend(create_test_config(tmpdir, os.path.join(tmpdir, 'cache'), 's3'), 'rpm')
+        keys = [f"el9/x86_64/pkg-{i}.rpm" for i in range(2500)]
+        stored = set(keys)
+        refused = set()
+        batches = []
+        
+        def mock_delete_objects(Bucket, Delete):
+            batch = [obj['Key'] for obj in Delete['Objects']]
+            batches.append(len(batch))
+            stored.difference_update(set(batch) - refused)
+            errors = [{'Key': key, 'Code': 'AccessDenied', 'Message': 'Access Denied'}
+                      for key in batch if key in refused]
+            return {'Errors': errors} if errors else {}
+        
+        backend.s3_client.delete_objects = mock_delete_objects
+        
+        backend.delete_files(keys)
+        assert sorted(batches) == [500, 1000, 1000]
+        assert not stored
+        print("✓ At most 1000 keys per request")
+        
+        stored.update(keys[:3])
+        refused.add(keys[1])
+        try:
+            backend.delete_files(keys[:3])
+            assert False, "Expected ClientError"
+        except ClientError as e:
+            assert e.response['Error']['Key'] == keys[1]
+        assert stored == {keys[1]}
+        print("✓ Per-key errors are raised")
+        
+        stored.update(keys[:3])
+        assert backend.try_delete_files(keys[:3]) == {keys[1]: 'Access Denied'}
+        assert stored == {keys[1]}
+        print("✓ try_delete_files names each refused key")
+        
+        return True
+
+
+def test_s3_delete_prefix():
+    """Test that a prefix delete removes each listed page in one request"""
+    print("=" * 60)
+    print("Test: S3 Prefix Delete")
+    print("=" * 60)
+    
+    with tempfile.TemporaryDirectory() as tmpdir:
+        backend = S3StorageBackend(create_test_config(tmpdir, os.path.join(tmpdir, 'cache'), 's3'), 'rpm')
+        stored = {f"el9/x86_64/repodata.backup/file-{i}" for i in range(2500)}
+        stored.add('el9/x86_64/repodata/repomd.xml')
+        batches = []
+        
+        def mock_paginate(Bucket, Prefix):
+            keys = sorted(key for key in stored if key.startswith(Prefix))
+            for i in range(0, len(keys), 1000):
+                yield {'Contents': [{'Key': key} for key in keys[i:i + 1000]]}
+        
+        def mock_delete_objects(Bucket, Delete):
+            batch = [obj['Key'] for obj in Delete['Objects']]
+            batches.append(len(batch))
+            stored.difference_update(batch)
+            return {}
+        
+        backend.s3_client.get_paginator = lambda operation: SimpleNamespace(paginate=mock_paginate)
+        backend.s3_client.delete_objects = mock_delete_objects
+        
+        assert backend.delete_prefix('el9/x86_64/repodata.backup/') == 2500
+        assert sorted(batches) == [500, 1000, 1000]
+        assert stored == {'el9/x86_64/repodata/repomd.xml'}
+        print("✓ Every listed page deleted, other keys kept")
+        
+        return True
+
+
+def test_s3_metadata_cache():
+    """Test the ETag-keyed cache of downloaded metadata"""
+    print("=" * 60)
+    print("Test: S3 Metadata Cache")
+    print("=" * 60)
+    
+    with tempfile.TemporaryDirectory() as tmpdir:
+        local_dir = os.path.join(tmpdir, 'local')
+        cache_dir = os.path.join(tmpdir, 'cache')
+        os.makedirs(os.path.join(local_dir, 'repodata'))
+        with open(os.path.join(local_dir, 'repodata', 'repomd.xml'), 'w') as f:
+            f.write('<repomd/>')
+        with open(os.path.join(local_dir, 'repodata', 'old.xml'), 'w') as f:
+            f.write('old')
+        
+        S3StorageBackend._update_cache(cache_dir, local_dir, {'repodata/old.xml': 'e0'}, ['repodata/old.xml'])
+        S3StorageBackend._update_cache(cache_dir, local_dir, {'repodata/repomd.xml': 'e1'}, ['repodata/repomd.xml'])
+        assert sorted(os.listdir(os.path.join(cache_dir, 'repodata'))) == ['repomd.xml', 'repomd.xml.etag']
+        print("✓ Downloads cached and entries gone from storage dropped")
+        
+        target = os.path.join(tmpdir, 'copy.xml')
+        assert S3StorageBackend._copy_cached(cache_dir, 'repodata/repomd.xml', 'e1', 9, target)
+        with open(target) as f:
+            assert f.read() == '<repomd/>'
+        assert not S3StorageBackend._copy_cached(cache_dir, 'repodata/repomd.xml', 'e2', 9, target)
+        assert not S3StorageBackend._copy_cached(cache_dir, 'repodata/repomd.xml', 'e1', 10, target)
+        assert not S3StorageBackend._copy_cached(cache_dir, 'repodata/missing.xml', 'e1', 9, target)
+        print("✓ Cached copy used only when ETag and size match")
+        
+        return True
+
+
+def test_s3_get_sha256():
+    """Test reading the SHA256 S3 stored at upload time"""
+    print("=" * 60)
+    print("Test: S3 Stored SHA256")
+    print("=" * 60)
+    
+    with tempfile.TemporaryDirectory() as tmpdir:
+        config = create_test_config(tmpdir, os.path.join(tmpdir, 'cache'), 's3')
+        digest = hashlib.sha256(b'metadata').digest()
+        heads = {
+            'whole': {'ChecksumSHA256': base64.b64encode(digest).decode()},
+            'multipart': {'ChecksumSHA256': base64.b64encode(digest).decode() + '-3'},
+            'none': {},
+        }
+        
+        def mock_head_object(Bucket, Key, ChecksumMode):
+            return heads[Key]
+        
+        backend = S3StorageBackend(config, 'rpm')
+        backend.s3_client.head_object = mock_head_object
+        assert backend.upload_args == {'ChecksumAlgorithm': 'SHA256'}
+        assert backend.get_sha256('whole') == digest.hex()
+        assert backend.get_sha256('multipart') is None
+        assert backend.get_sha256('none') is None
+        print("✓ Whole-object checksums returned as hex")
+        
+        config.set('backend.s3.checksum_sha256', False)
+        backend = S3StorageBackend(config, 'rpm')
+        backend.s3_client.head_object = mock_head_object
+        assert backend.upload_args == {}
+        assert backend.get_sha256('whole') is None
+        print("✓ Checksums can be turned off")
+        
+        # Custom endpoints default to off, but can opt in
+        config.unset('backend.s3.checksum_sha256')
+        config.set('backend.s3.endpoint', 'http://localhost:9000')
+        assert S3StorageBackend(config, 'rpm').upload_args == {}
+        config.set('backend.s3.checksum_sha256', True)
+        assert S3StorageBackend(config, 'rpm').upload_args == {'ChecksumAlgorithm': 'SHA256'}
+        print("✓ Checksums off by default for custom endpoints")
+        
+        return True
+
+
+def test_versioned_backup_restore():
+    """Test metadata backups on unversioned and versioned storage"""
+    print("=" * 60)
+    print("Test: Versioned Backup and Restore")
+    print("=" * 60)
+    
+    with tempfile.TemporaryDirectory() as tmpdir:
+        storage_path = os.path.join(tmpdir, 'storage')
+        repo_dir = os.path.join(tmpdir, 'local')
+        os.makedirs(os.path.join(repo_dir, 'repodata'))
+        with open(os.path.join(repo_dir, 'repodata', 'repomd.xml'), 'w') as f:
+            f.write('<repomd/>')
+        
+        # Unversioned storage: metadata is copied to a backup prefix
+        repo = YumRepo(create_test_config(storage_path, os.path.join(tmpdir, 'cache')))
+        repo._backup_metadata(repo_dir, 'el9/x86_64')
+        assert repo.backup_versions is None
+        assert repo.storage.list_files(f"{repo.backup_metadata}/") == ['repomd.xml']
+        repo._restore_metadata('el9/x86_64')
+        assert repo.storage.list_files('el9/x86_64/repodata/') == ['repomd.xml']
+        repo._cleanup_backup()
+        assert repo.backup_metadata is None
+        try:
+            repo.storage.restore_file_version('el9/x86_64/repodata/repomd.xml', 'v1')
+            assert False, "Expected ValueError"
+        except ValueError:
+            pass
+        print("✓ Unversioned storage backs up by copying")
+        
+        # Versioned bucket: the latest version of each key is recorded
+        repo = YumRepo(create_test_config(storage_path, os.path.join(tmpdir, 'cache'), 's3'))
+        current = {'el9/x86_64/repodata/repomd.xml': 'v1',
+                   'el9/x86_64/repodata/a-primary.xml.gz': 'v1'}
+        restored = []
+        
+        def mock_paginate(Bucket, Prefix, Delimiter=None):
+            versions = [{'Key': key, 'VersionId': version, 'IsLatest': True}
+                        for key, version in current.items() if key.startswith(Prefix)]
+            versions.append({'Key': Prefix + 'repomd.xml', 'VersionId': 'v0', 'IsLatest': False})
+            yield {'Versions': versions}
+        
+        def mock_delete_objects(Bucket, Delete):
+            for obj in Delete['Objects']:
+                del current[obj['Key']]
+            return {}
+        
+        def mock_copy_object(Bucket, CopySource, Key, **kwargs):
+            current[Key] = CopySource['VersionId']
+            restored.append((Key, CopySource['VersionId']))
+        
+        repo.storage.s3_client.get_bucket_versioning = lambda Bucket: {'Status': 'Enabled'}
+        repo.storage.s3_client.get_paginator = lambda operation: SimpleNamespace(paginate=mock_paginate)
+        repo.storage.s3_client.delete_objects = mock_delete_objects
+        repo.storage.s3_client.copy_object = mock_copy_object
+        
+        repo._backup_metadata(repo_dir, 'el9/x86_64')
+        assert repo.backup_versions == {'repomd.xml': 'v1', 'a-primary.xml.gz': 'v1'}
+        assert repo.backup_metadata is None
+        print("✓ Versioned storage records object versions")
+        
+        # A failed update replaced repomd.xml and wrote a new primary
+        current.clear()
+        current.update({'el9/x86_64/repodata/repomd.xml': 'v2',
+                        'el9/x86_64/repodata/b-primary.xml.gz': 'v1'})
+        repo._restore_metadata('el9/x86_64')
+        assert current == {'el9/x86_64/repodata/repomd.xml': 'v1',
+                           'el9/x86_64/repodata/a-primary.xml.gz': 'v1'}
+        assert sorted(restored) == [('el9/x86_64/repodata/a-primary.xml.gz', 'v1'),
+                                    ('el9/x86_64/repodata/repomd.xml', 'v1')]
+        repo._cleanup_backup()
+        assert repo.backup_versions is None
+        print("✓ Restore rolls back to the recorded versions")
+        
+        return True
+
+
 if __name__ == '__main__':
     print("=" * 60)
     print("Storage Backend Integration Tests")
@@ -181,6 +475,30 @@ if __name__ == '__main__':
     if not test_local_storage_merge():
         success = False
     
+    # Test 3: Matches stored file
+    if not test_matches_stored_file():
+        success = False
+    
+    # Test 4: S3 batched deletes
+    if not test_s3_delete_files():
+        success = False
+    
+    # Test 5: S3 prefix delete
+    if not test_s3_delete_prefix():
+        success = False
+    
+    # Test 6: S3 metadata cache
+    if not test_s3_metadata_cache():
+        success = False
+    
+    # Test 7: S3 stored SHA256
+    if not test_s3_get_sha256():
+        success = False
+    
+    # Test 8: Versioned backup and restore
+    if not test_versioned_backup_restore():
+        success = False
+    
     print()
     print("=" * 60)
     if success:
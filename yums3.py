@@ -11,20 +11,29 @@ Licensed under the MIT License. See LICENSE file for details.
 import argparse
 import os
 import sys
-import re
 
 from core.config import load_config, config_command
-from core.yum import YumRepo
 from core import Colors
 
-try:
-    from lxml import etree as ET
-except ImportError:
-    print("ERROR: lxml is not installed. Install it with: pip install lxml")
-    sys.exit(1)
 
+def __getattr__(name):
+    # YumRepo pulls in boto3 and lxml; import it on first use (``from yums3 import
+    # YumRepo`` still works) so the config command starts quickly
+    if name == 'YumRepo':
+        from core.yum import YumRepo
+        return YumRepo
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+_PARSER = None
+
+
+def _build_parser():
+    """Build the command-line parser, once per process"""
+    global _PARSER
+    if _PARSER is not None:
+        return _PARSER
 
-def main():
     parser = argparse.ArgumentParser(
         description='Efficient YUM repository manager for S3',
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -75,7 +84,12 @@ def main():
     config_parser.add_argument('--local', action='store_true', help='Use local config (./yums3.conf)')
     config_parser.add_argument('--system', action='store_true', help='Use system config (/etc/yums3.conf)')
     
-    args = parser.parse_args()
+    _PARSER = parser
+    return parser
+
+
+def main():
+    args = _build_parser().parse_args()
     
     # Handle config command
     if args.command == 'config':
@@ -84,11 +98,11 @@ def main():
     # Load configuration
     try:
         config = load_config(args, 'rpm')
-        print(config)
-               
+        
         # Initialize repository manager
+        # Imported here so the config command doesn't pay for boto3/lxml
+        from core.yum import YumRepo
         repo = YumRepo(config)
-        print(repo)
         
         # Handle validate command
         if args.command == 'validate':
@@ -116,8 +130,7 @@ def main():
             print(f"  Destination:  {args.dst}")
             print(f"  Architecture: {args.arch or 'x86_64'}")
             print(f"  Packages:     {len(args.package_names)}")
-            for pkg in args.package_names:
-                print(f"    • {pkg}")
+            sys.stdout.writelines(f"    • {pkg}\n" for pkg in args.package_names)
             print()
 
             # Confirm operation
@@ -136,8 +149,9 @@ def main():
             return 0
         
         # Determine operation details based on command
+        base_names = list(map(os.path.basename, args.rpm_files))
         if args.command == 'remove':
-            rpm_filenames = [os.path.basename(f) for f in args.rpm_files]
+            rpm_filenames = base_names
             arch, el_version = repo._detect_from_filename(rpm_filenames[0])
         elif args.command == 'add':
             rpm_filenames = args.rpm_files
@@ -160,8 +174,7 @@ def main():
         print(f"  Target:       {target}")
         print(f"  Action:       {Colors.bold(action)}")
         print(f"  Packages:     {len(args.rpm_files)}")
-        for f in args.rpm_files:
-            print(f"    • {os.path.basename(f)}")
+        sys.stdout.writelines(f"    • {name}\n" for name in base_names)
         print()
         
         # Confirm operation